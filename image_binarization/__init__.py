@@ -0,0 +1 @@
+"""图像二值化处理包（无界面的批处理与处理核心）"""
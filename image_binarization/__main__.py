@@ -0,0 +1,242 @@
+"""命令行入口
+
+python -m image_binarization batch in_dir out_dir --threshold 127 --workers N --engine fused
+python -m image_binarization watch drop_dir out_dir --mode otsu --interval 1 --settle 2
+python -m image_binarization bench --sizes 1 4 16 --output bench.json --compare old.json
+
+性能配置（batch/watch/bench 共用）：--cv-threads、--blas-threads、--affinity、--no-cv-optimized，
+或环境变量 IMAGE_BINARIZATION_CV_THREADS / _BLAS_THREADS / _AFFINITY / _CV_OPTIMIZED。
+"""
+import argparse
+import os
+import sys
+
+from .batch import run_batch
+from .fused import ENGINES, numba_available
+from .performance import (PerformanceProfile, format_hardware_report, parse_affinity,
+                          parse_threads)
+from .result_cache import ResultCache
+from .benchmark import (DEFAULT_SIZES_MP, REGRESSION_TOLERANCE, run_benchmark,
+                        compare_results, write_results, load_results)
+from .thresholds import THRESHOLD_MODES, ThresholdSettings
+from .watch import DirectoryWatcher
+
+
+def add_threshold_arguments(parser):
+    """阈值模式及解码相关参数（batch 与 watch 共用）"""
+    parser.add_argument('--threshold', type=int, default=127, choices=range(256),
+                        metavar='0-255', help='二值化阈值（默认127，仅 global 模式使用）')
+    parser.add_argument('--mode', default='global', choices=list(THRESHOLD_MODES),
+                        help='阈值模式（默认 global）')
+    parser.add_argument('--window', type=int, default=31,
+                        help='局部阈值窗口大小（奇数，默认31）')
+    parser.add_argument('--k', type=float, default=None,
+                        help='Sauvola/Niblack 的 k 值（默认分别为0.2和-0.2）')
+    parser.add_argument('--offset', type=float, default=2,
+                        help='自适应阈值的偏移量 C（默认2）')
+    parser.add_argument('--gray-decode', action='store_true',
+                        help='直接解码为灰度（IMREAD_GRAYSCALE），彩色扫描件的读取更快、内存更少')
+    parser.add_argument('--engine', default='standard', choices=list(ENGINES),
+                        help='处理引擎（默认 standard；fused 按行块一次完成灰度、阈值和打包，'
+                             '不生成完整的灰度图；fused-numba 改用 numba 编译的内核）')
+
+
+def engine_from_args(args):
+    """处理引擎；选择 numba 内核但未安装 numba 时退回 OpenCV 实现"""
+    if args.engine == 'fused-numba' and not numba_available():
+        print("未安装 numba，改用 --engine fused")
+        return 'fused'
+    return args.engine
+
+
+def settings_from_args(args):
+    """由命令行参数构造阈值参数"""
+    return ThresholdSettings(args.mode, threshold=args.threshold, window=args.window,
+                             k=args.k, offset=args.offset)
+
+
+def add_cache_arguments(parser):
+    """结果缓存相关参数（batch 与 watch 共用）"""
+    parser.add_argument('--cache', action='store_true',
+                        help='启用结果缓存：同一源文件、同一阈值参数再次处理时不解码直接写出')
+    parser.add_argument('--cache-dir', default=None, help='结果缓存目录（默认在临时缓存目录下）')
+    parser.add_argument('--cache-size-mb', type=float, default=None,
+                        help='结果缓存大小上限（MB，默认1024，超出后按最近使用时间淘汰）')
+
+
+def cache_from_args(args):
+    """由命令行参数构造结果缓存，未启用时返回 None"""
+    if not (args.cache or args.cache_dir):
+        return None
+    max_bytes = int(args.cache_size_mb * 1024 ** 2) if args.cache_size_mb else None
+    return ResultCache(args.cache_dir, max_bytes)
+
+
+def _argument_type(parse):
+    """把解析函数的 ValueError 转为 argparse 的错误信息"""
+    def convert(text):
+        try:
+            return parse(text)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return convert
+
+
+def add_performance_arguments(parser):
+    """工作进程性能配置参数（未指定时使用环境变量，再未设置时使用默认值）"""
+    parser.add_argument('--cv-threads', type=_argument_type(parse_threads), default=None, metavar='auto|N',
+                        help='每个工作进程的 OpenCV 线程数（默认 auto，即可用核数 / 进程数；0 为单线程）')
+    parser.add_argument('--blas-threads', type=_argument_type(parse_threads), default=None, metavar='auto|N',
+                        help='每个工作进程的 BLAS/OpenMP 线程数（OMP/OPENBLAS/MKL_NUM_THREADS，默认 auto）')
+    parser.add_argument('--affinity', type=_argument_type(parse_affinity), default=None, metavar='none|auto|CPU列表',
+                        help='把工作进程绑定到互不重叠的核上：auto 平均分配可用核，'
+                             '或指定 CPU 列表如 0-7,16-23（默认不绑定，仅 Linux）')
+    parser.add_argument('--no-cv-optimized', action='store_true',
+                        help='关闭 OpenCV 的优化代码路径（SIMD），用于对比测试')
+
+
+def profile_from_args(args):
+    """由命令行参数和环境变量构造性能配置（命令行优先）"""
+    profile = PerformanceProfile.from_env()
+    if args.cv_threads is not None:
+        profile.cv_threads = args.cv_threads
+    if args.blas_threads is not None:
+        profile.blas_threads = args.blas_threads
+    if args.affinity is not None:
+        profile.affinity = args.affinity
+    if args.no_cv_optimized:
+        profile.optimized = False
+    return profile
+
+
+def report_performance(profile, workers):
+    """启动时报告 SIMD 特性和工作进程的配置，便于复现吞吐量调优的结果"""
+    profile.apply()  # 主进程的优化开关与工作进程一致，报告才能反映实际启用的 SIMD
+    print(format_hardware_report())
+    print(f"性能配置: {profile.describe(workers)}")
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog='python -m image_binarization',
+                                     description='图像二值化处理器（无界面模式）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    batch_parser = subparsers.add_parser('batch', help='批量二值化目录中的图片')
+    batch_parser.add_argument('input_dir', help='输入目录')
+    batch_parser.add_argument('output_dir', help='输出目录')
+    add_threshold_arguments(batch_parser)
+    batch_parser.add_argument('--workers', type=int, default=None,
+                              help='工作进程数（默认为CPU核数）')
+    batch_parser.add_argument('--max-in-flight', type=int, default=None,
+                              help='同时提交的最大任务数（默认为进程数的2倍）')
+    batch_parser.add_argument('--recursive', action='store_true', help='递归处理子目录')
+    batch_parser.add_argument('--ext', default='.png', help='输出文件扩展名（默认.png；.png/.tiff/.pbm 为1位格式）')
+    add_cache_arguments(batch_parser)
+    add_performance_arguments(batch_parser)
+    
+    watch_parser = subparsers.add_parser('watch', help='监视投放目录，新图片写入完成后自动二值化')
+    watch_parser.add_argument('input_dir', help='监视的投放目录')
+    watch_parser.add_argument('output_dir', help='输出目录')
+    add_threshold_arguments(watch_parser)
+    watch_parser.add_argument('--workers', type=int, default=None,
+                              help='工作进程数（默认为CPU核数）')
+    watch_parser.add_argument('--max-in-flight', type=int, default=None,
+                              help='同时提交的最大任务数（默认为进程数的2倍）')
+    watch_parser.add_argument('--recursive', action='store_true', help='递归监视子目录')
+    watch_parser.add_argument('--ext', default='.png', help='输出文件扩展名（默认.png；.png/.tiff/.pbm 为1位格式）')
+    watch_parser.add_argument('--interval', type=float, default=1.0, help='扫描间隔（秒，默认1）')
+    watch_parser.add_argument('--settle', type=float, default=2.0,
+                              help='文件大小和修改时间保持不变多久后才处理（秒，默认2）')
+    watch_parser.add_argument('--ledger', default=None,
+                              help='台账文件路径（默认为输出目录中的 .binarization_ledger.sqlite）')
+    watch_parser.add_argument('--once', action='store_true', help='处理完当前文件后退出')
+    add_cache_arguments(watch_parser)
+    add_performance_arguments(watch_parser)
+    
+    bench_parser = subparsers.add_parser('bench', help='用合成图像测量各处理阶段的耗时和峰值内存')
+    bench_parser.add_argument('--sizes', type=float, nargs='+', default=list(DEFAULT_SIZES_MP),
+                              metavar='MP', help='测试的图像尺寸（百万像素，默认 1 4 16 50 100 200）')
+    bench_parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数（默认3）')
+    bench_parser.add_argument('--format', default='.jpg', choices=['.jpg', '.png', '.bmp', '.tiff'],
+                              help='解码阶段使用的源文件格式（默认.jpg）')
+    bench_parser.add_argument('--seed', type=int, default=0, help='合成图像的随机种子')
+    bench_parser.add_argument('--output', default='benchmark.json', help='结果 JSON 文件（默认 benchmark.json）')
+    bench_parser.add_argument('--compare', default=None, help='与之前的结果 JSON 比较，变慢时返回非零')
+    bench_parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                              help='允许的变慢比例（默认0.2，即20%%）')
+    add_performance_arguments(bench_parser)
+    
+    return parser
+
+
+def main(argv=None):
+    """主函数"""
+    args = build_parser().parse_args(argv)
+    try:
+        profile = profile_from_args(args)
+    except ValueError as e:
+        print(f"性能配置错误: {e}")  # 环境变量中的值无法解析
+        return 2
+    
+    if args.command == 'batch':
+        report_performance(profile, args.workers or os.cpu_count() or 1)
+        summary = run_batch(args.input_dir, args.output_dir,
+                            threshold=settings_from_args(args),
+                            workers=args.workers,
+                            recursive=args.recursive,
+                            extension=args.ext,
+                            max_in_flight=args.max_in_flight,
+                            cache=cache_from_args(args),
+                            gray_decode=args.gray_decode,
+                            engine=engine_from_args(args),
+                            profile=profile)
+        return 1 if summary['failed'] else 0
+    
+    if args.command == 'watch':
+        report_performance(profile, args.workers or os.cpu_count() or 1)
+        watcher = DirectoryWatcher(args.input_dir, args.output_dir,
+                                   threshold=settings_from_args(args),
+                                   workers=args.workers,
+                                   recursive=args.recursive,
+                                   extension=args.ext,
+                                   poll_interval=args.interval,
+                                   settle_time=args.settle,
+                                   ledger_path=args.ledger,
+                                   max_in_flight=args.max_in_flight,
+                                   cache=cache_from_args(args),
+                                   gray_decode=args.gray_decode,
+                                   engine=engine_from_args(args),
+                                   profile=profile)
+        try:
+            summary = watcher.run(once=args.once)
+        except KeyboardInterrupt:
+            return 0
+        return 1 if summary['failed'] else 0
+    
+    if args.command == 'bench':
+        sizes = [int(size) if float(size).is_integer() else size for size in args.sizes]
+        report_performance(profile, 1)
+        results = run_benchmark(sizes, repeat=args.repeat, image_format=args.format, seed=args.seed,
+                                profile=profile)
+        write_results(results, args.output)
+        print(f"结果已写入 {args.output}")
+        
+        if args.compare:
+            regressions = compare_results(load_results(args.compare), results, args.tolerance)
+            for item in regressions:
+                print(f"变慢: {item['megapixels']} MP {item['stage']} "
+                      f"{item['baseline'] * 1000:.1f} ms → {item['current'] * 1000:.1f} ms "
+                      f"(×{item['ratio']:.2f})")
+            if regressions:
+                return 1
+            print("未发现性能回退")
+        
+        failed = [r for r in results['results'] if 'error' in r]
+        return 1 if failed else 0
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
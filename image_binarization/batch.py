@@ -0,0 +1,335 @@
+"""无界面批量二值化：读取 → 灰度 → 阈值 → 写出，多进程并行处理"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+
+from .binarization_core import (read_image, load_gray, to_grayscale, compute_histogram,
+                                pack_with, write_binary)
+from .fused import FusedBinarizer, engine_backend
+from .performance import PerformanceProfile
+from .result_cache import GRAY_METHOD, GRAY_DECODE_METHOD, result_key, source_digest
+
+# 与界面“导入图片”对话框支持的格式保持一致
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tiff', '.tif', '.gif')
+
+
+def iter_image_files(input_dir, recursive=False):
+    """遍历目录下的图片文件，按路径排序返回"""
+    if recursive:
+        paths = []
+        for root, _, files in os.walk(input_dir):
+            for name in files:
+                paths.append(os.path.join(root, name))
+    else:
+        paths = [os.path.join(input_dir, name) for name in os.listdir(input_dir)]
+    return sorted(p for p in paths
+                  if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def output_path_for(input_path, input_dir, output_dir, extension='.png'):
+    """计算输出路径：保留相对目录结构，替换扩展名"""
+    relative = os.path.relpath(input_path, input_dir)
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + extension)
+
+
+def crop_to_roi(image, roi):
+    """按 ROI（x, y, 宽, 高）裁剪（返回视图）；超出图像范围的部分被截掉"""
+    if roi is None:
+        return image
+    x, y, width, height = roi
+    img_height, img_width = image.shape[:2]
+    x1, y1 = max(0, min(x, img_width)), max(0, min(y, img_height))
+    x2, y2 = min(img_width, x + width), min(img_height, y + height)
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"裁剪区域 {tuple(roi)} 超出图像范围 {img_width} × {img_height}")
+    return image[y1:y2, x1:x2]
+
+
+def binarize_file(input_path, output_path, threshold, cache=None, gray_decode=False, roi=None,
+                  engine='standard'):
+    """对单个文件执行二值化，返回各阶段耗时（秒）
+
+    threshold 可以是整数阈值或 ThresholdSettings（Otsu、三角法、局部阈值等）；
+    结果按位打包，PNG/TIFF/PBM 输出为1位格式。
+    传入 ResultCache 时先按源文件哈希查找缓存，命中则不解码直接写出。
+    gray_decode=True 时直接解码为灰度（IMREAD_GRAYSCALE），省去三通道缓冲区和颜色转换。
+    roi 为 (x, y, 宽, 高) 时只处理该区域（界面上裁剪后批量应用到其他页面）。
+    engine 为 'fused'/'fused-numba' 时用融合引擎按行块一次完成灰度、阈值和打包，
+    不生成完整的灰度图（结果与标准流程逐位相同）。
+    """
+    timings = {}
+    
+    key = None
+    if cache is not None:
+        start = time.perf_counter()
+        key = result_key(source_digest(input_path), roi, threshold,
+                         GRAY_DECODE_METHOD if gray_decode else GRAY_METHOD)
+        cached = cache.get(key)
+        timings['lookup'] = time.perf_counter() - start
+        if cached is not None:
+            start = time.perf_counter()
+            write_binary(output_path, cached.packed)
+            timings['write'] = time.perf_counter() - start
+            timings['total'] = sum(timings.values())
+            timings['cache_hit'] = True
+            return timings
+    
+    backend = engine_backend(engine)
+    if backend is not None:
+        return _binarize_file_fused(input_path, output_path, threshold, cache, key, gray_decode, roi,
+                                    backend, timings)
+    
+    if gray_decode:
+        start = time.perf_counter()
+        gray_image = load_gray(input_path)
+        timings['read'] = time.perf_counter() - start
+        timings['gray'] = 0.0
+    else:
+        start = time.perf_counter()
+        image = read_image(input_path)
+        timings['read'] = time.perf_counter() - start
+        
+        # 与界面一致：BGR→RGB→GRAY 等价于直接 BGR→GRAY
+        start = time.perf_counter()
+        gray_image = to_grayscale(image, cv2.COLOR_BGR2GRAY)
+        timings['gray'] = time.perf_counter() - start
+    
+    gray_image = crop_to_roi(gray_image, roi)
+    
+    start = time.perf_counter()
+    binary_image = pack_with(gray_image, threshold)
+    timings['threshold'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    write_binary(output_path, binary_image)
+    timings['write'] = time.perf_counter() - start
+    
+    if key is not None:
+        start = time.perf_counter()
+        cache.put(key, binary_image, compute_histogram(gray_image))
+        timings['cache_store'] = time.perf_counter() - start
+    
+    timings['total'] = sum(timings.values())
+    timings['cache_hit'] = False
+    return timings
+
+
+def _binarize_file_fused(input_path, output_path, threshold, cache, key, gray_decode, roi, backend, timings):
+    """binarize_file 的融合引擎路径（灰度已合并到阈值阶段，耗时计入 threshold）"""
+    start = time.perf_counter()
+    image = load_gray(input_path) if gray_decode else read_image(input_path)
+    timings['read'] = time.perf_counter() - start
+    timings['gray'] = 0.0
+    
+    image = crop_to_roi(image, roi)
+    
+    start = time.perf_counter()
+    binary_image, _, histogram = FusedBinarizer(cv2.COLOR_BGR2GRAY, backend=backend).binarize(
+        image, threshold, with_histogram=key is not None)
+    timings['threshold'] = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    write_binary(output_path, binary_image)
+    timings['write'] = time.perf_counter() - start
+    
+    if key is not None:
+        start = time.perf_counter()
+        cache.put(key, binary_image, histogram)
+        timings['cache_store'] = time.perf_counter() - start
+    
+    timings['total'] = sum(timings.values())
+    timings['cache_hit'] = False
+    return timings
+
+
+def iter_batch(executor, tasks, max_in_flight, cancelled=None):
+    """向进程池提交任务并按完成顺序产出 (路径, 耗时, 异常)
+
+    tasks 为 (路径, 输出路径) 的迭代器，同时提交的任务数不超过 max_in_flight；
+    cancelled 为 threading.Event 时，设置后不再提交新任务，尚未开始的任务被取消。
+    """
+    pending = {}
+    task_iter = iter(tasks)
+    
+    def submit_next():
+        if cancelled is not None and cancelled.is_set():
+            return False
+        task = next(task_iter, None)
+        if task is None:
+            return False
+        path, submit = task
+        pending[submit(executor)] = path
+        return True
+    
+    while len(pending) < max_in_flight and submit_next():
+        pass
+    
+    while pending:
+        done, _ = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+        if cancelled is not None and cancelled.is_set():
+            for future in pending:
+                future.cancel()
+        for future in done:
+            path = pending.pop(future)
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, None, e
+            submit_next()
+        if cancelled is not None and cancelled.is_set():
+            # 已在运行的任务无法中断，等待它们完成（结果照常产出）
+            for future in [f for f in pending if f.cancelled()]:
+                del pending[future]
+
+
+def batch_tasks(files, input_dir, output_dir, threshold, extension='.png', cache=None,
+                gray_decode=False, roi=None, engine='standard'):
+    """为 iter_batch 生成 (路径, 提交函数) 任务"""
+    for path in files:
+        target = output_path_for(path, input_dir, output_dir, extension)
+        yield path, (lambda executor, path=path, target=target: executor.submit(
+            binarize_file, path, target, threshold, cache, gray_decode, roi, engine))
+
+
+def run_batch(input_dir, output_dir, threshold=127, workers=None, recursive=False,
+              extension='.png', max_in_flight=None, cache=None, gray_decode=False,
+              engine='standard', profile=None, log=print):
+    """批量处理目录中的图片，返回汇总结果
+    
+    同时提交的任务数不超过 max_in_flight（默认为进程数的2倍），
+    避免一次性把成千上万个任务压入进程池。cache 为 ResultCache 时启用结果缓存，
+    gray_decode=True 时直接解码为灰度，engine 选择处理引擎（见 fused.ENGINES）。
+    profile 为工作进程的 PerformanceProfile，默认由环境变量决定。
+    """
+    files = iter_image_files(input_dir, recursive)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    profile = profile or PerformanceProfile.from_env()
+    
+    results = []
+    failures = []
+    start = time.perf_counter()
+    
+    with ProcessPoolExecutor(max_workers=workers, **profile.executor_kwargs(workers)) as executor:
+        tasks = batch_tasks(files, input_dir, output_dir, threshold, extension, cache, gray_decode,
+                            engine=engine)
+        for path, timings, error in iter_batch(executor, tasks, max_in_flight):
+            index = len(results) + len(failures) + 1
+            if error is not None:
+                failures.append((path, str(error)))
+                log(f"[{index}/{len(files)}] 失败 {path}: {error}")
+                continue
+            
+            results.append((path, timings))
+            if timings['cache_hit']:
+                log(f"[{index}/{len(files)}] {path}  缓存命中, "
+                    f"查找 {timings['lookup'] * 1000:.1f} ms, "
+                    f"写出 {timings['write'] * 1000:.1f} ms")
+            else:
+                log(f"[{index}/{len(files)}] {path}  "
+                    f"读取 {timings['read'] * 1000:.1f} ms, "
+                    f"灰度 {timings['gray'] * 1000:.1f} ms, "
+                    f"阈值 {timings['threshold'] * 1000:.1f} ms, "
+                    f"写出 {timings['write'] * 1000:.1f} ms, "
+                    f"合计 {timings['total'] * 1000:.1f} ms")
+    
+    elapsed = time.perf_counter() - start
+    throughput = len(results) / elapsed if elapsed > 0 else 0.0
+    log(f"完成 {len(results)} 张，失败 {len(failures)} 张，"
+        f"总耗时 {elapsed:.2f} s，吞吐量 {throughput:.2f} 张/秒")
+    
+    return {
+        'processed': results,
+        'failed': failures,
+        'elapsed': elapsed,
+        'throughput': throughput,
+    }
+
+
+class BatchJob:
+    """在后台线程中运行的批量任务（供界面使用）：可随时查询进度，可取消"""
+    
+    def __init__(self, files, input_dir, output_dir, threshold=127, workers=None,
+                 extension='.png', cache=None, gray_decode=False, roi=None, max_in_flight=None,
+                 profile=None):
+        self.files = list(files)
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.threshold = threshold
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.extension = extension
+        self.cache = cache
+        self.gray_decode = gray_decode
+        self.roi = roi
+        self.profile = profile or PerformanceProfile.from_env()
+        
+        self.processed = 0
+        self.failures = []
+        self.started = None
+        self.finished = None
+        self.error = None  # 进程池本身出错（而不是单个文件失败）时的异常
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='batch-job', daemon=True)
+        self._thread.start()
+        return self
+    
+    def cancel(self):
+        """停止提交新文件并取消尚未开始的文件（正在处理的文件会处理完）"""
+        self._cancelled.set()
+    
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+    
+    @property
+    def done(self):
+        return self.finished is not None
+    
+    def _run(self):
+        try:
+            # 界面进程中已有多个线程，fork 出的子进程可能继承被占用的锁，因此使用 spawn
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.workers,
+                                     **self.profile.executor_kwargs(self.workers, context)) as executor:
+                tasks = batch_tasks(self.files, self.input_dir, self.output_dir, self.threshold,
+                                    self.extension, self.cache, self.gray_decode, self.roi)
+                for path, _, error in iter_batch(executor, tasks, self.max_in_flight, self._cancelled):
+                    with self._lock:
+                        if error is None:
+                            self.processed += 1
+                        else:
+                            self.failures.append((path, str(error)))
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.perf_counter()
+    
+    def progress(self):
+        """当前进度：总数、完成数、失败数、已用时间、吞吐量（张/秒）和预计剩余时间（秒）"""
+        with self._lock:
+            processed = self.processed
+            failed = len(self.failures)
+        end = self.finished if self.finished is not None else time.perf_counter()
+        elapsed = end - self.started if self.started is not None else 0.0
+        completed = processed + failed
+        throughput = completed / elapsed if elapsed > 0 else 0.0
+        remaining = len(self.files) - completed
+        eta = remaining / throughput if throughput > 0 else None
+        return {
+            'total': len(self.files),
+            'processed': processed,
+            'failed': failed,
+            'elapsed': elapsed,
+            'throughput': throughput,
+            'eta': eta,
+        }
@@ -0,0 +1,262 @@
+"""无界面基准测试：用合成图像测量各处理阶段的耗时和峰值内存，结果写为 JSON
+
+每个图像尺寸在独立的子进程中运行，峰值常驻内存（peak RSS）互不影响；
+各阶段与界面/批处理实际调用的函数一致：缩小解码预览、解码、灰度、直方图、阈值、预览缩放、
+PhotoImage 转换（有图形环境时）、像素统计、按位打包和编码（8位与1位 PNG），
+以及融合引擎（彩色图一次得到打包结果和统计，对应前面灰度+阈值+打包+统计之和；安装 numba 时两种实现都测量）。
+"""
+import io
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from ._memory import peak_rss_bytes
+from .binarization_core import (load_image, load_gray, read_preview, to_grayscale,
+                                compute_histogram, count_pixels_from_histogram, count_white_pixels,
+                                binarize, fit_to_canvas)
+from .bitpacked import PackedBinary
+from .fused import FusedBinarizer, numba_available
+from .performance import PerformanceProfile, hardware_report
+from .pyramid import ImagePyramid
+
+# 默认测试的图像尺寸（百万像素）
+DEFAULT_SIZES_MP = (1, 4, 16, 50, 100, 200)
+
+# 合成图像的宽高比（4:3）
+ASPECT_RATIO = 4 / 3
+
+# 预览缩放的目标画布尺寸（与界面默认窗口中的画布大小相当）
+CANVAS_SIZE = (440, 700)
+
+# 比较两次结果时，超过该比例的变慢视为性能回退
+REGRESSION_TOLERANCE = 0.2
+
+# 变慢的绝对值小于该时间（秒）时忽略（亚毫秒级阶段的抖动）
+REGRESSION_MIN_SECONDS = 0.001
+
+
+def synthetic_image(megapixels, seed=0):
+    """生成可复现的 RGB 合成图像（渐变背景 + 噪声块 + 文字状条纹）"""
+    height = max(1, int(round((megapixels * 1_000_000 / ASPECT_RATIO) ** 0.5)))
+    width = max(1, int(round(height * ASPECT_RATIO)))
+    rng = np.random.default_rng(seed)
+
+    # 渐变背景只生成一行再广播赋值，避免为大图分配浮点中间数组
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    ramp = np.linspace(60, 220, width).astype(np.uint8)
+    image[:] = ramp[None, :, None]
+
+    # 平铺一块噪声，让编码和直方图不至于过于理想
+    tile = rng.integers(0, 40, (256, 256, 3), dtype=np.uint8)
+    for y in range(0, height, 256):
+        for x in range(0, width, 256):
+            block = image[y:y + 256, x:x + 256]
+            np.subtract(block, tile[:block.shape[0], :block.shape[1]], out=block, casting='unsafe')
+
+    # 深色横条模拟文本行
+    for y in range(0, height, 48):
+        image[y:y + 8:2, ::3] //= 4
+    return image
+
+
+def _timed(timings, name, func, *args, repeat=1, **kwargs):
+    """重复执行 func，记录每次耗时和执行后的峰值内存，返回最后一次的结果"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        result = None  # 释放上一次的结果，避免两份同时占用内存
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        samples.append(time.perf_counter() - start)
+    timings[name] = {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'samples': samples,
+        'peak_rss': peak_rss_bytes(),
+    }
+    return result
+
+
+def _photoimage_factory():
+    """返回把数组转换为 PhotoImage 的函数；没有图形环境时返回 (None, 原因)"""
+    try:
+        import tkinter as tk
+        from PIL import Image, ImageTk
+        root = tk.Tk()
+        root.withdraw()
+    except Exception as e:
+        return None, str(e)
+    return (lambda array: ImageTk.PhotoImage(Image.fromarray(array), master=root)), None
+
+
+def benchmark_size(megapixels, repeat=3, image_format='.jpg', seed=0):
+    """在当前进程中测量一个尺寸下的各阶段耗时（由 run_benchmark 在子进程中调用）"""
+    image = synthetic_image(megapixels, seed)
+    height, width = image.shape[:2]
+
+    # 先把合成图编码成文件，解码阶段从磁盘读取（与导入图片一致）
+    fd, source_path = tempfile.mkstemp(suffix=image_format)
+    os.close(fd)
+    try:
+        if not cv2.imwrite(source_path, cv2.cvtColor(image, cv2.COLOR_RGB2BGR)):
+            raise ValueError(f"无法写入测试图像: {source_path}")
+        file_size = os.path.getsize(source_path)
+        del image
+
+        timings = {}
+        baseline_rss = peak_rss_bytes()
+        # 缩小解码的预览（仅 JPEG），即界面的首次显示时间
+        if read_preview(source_path, max(CANVAS_SIZE)) is not None:
+            _timed(timings, 'decode_preview', read_preview, source_path, max(CANVAS_SIZE), repeat=repeat)
+        else:
+            timings['decode_preview'] = None
+        # 灰度导入（IMREAD_GRAYSCALE）放在彩色解码之前，峰值内存不受三通道缓冲区影响
+        _timed(timings, 'decode_gray', load_gray, source_path, repeat=repeat)
+        image = _timed(timings, 'decode', load_image, source_path, repeat=repeat)
+    finally:
+        os.remove(source_path)
+
+    gray_image = _timed(timings, 'grayscale', to_grayscale, image, repeat=repeat)
+    histogram = _timed(timings, 'histogram', compute_histogram, gray_image, repeat=repeat)
+    binary_image = _timed(timings, 'threshold', binarize, gray_image, 127, repeat=repeat)
+
+    # 预览缩放：每次都从新的金字塔开始，包含生成各层级的代价
+    display_size = fit_to_canvas(gray_image.shape, *CANVAS_SIZE)
+    display_image = _timed(timings, 'resize',
+                           lambda: ImagePyramid(image).resize(*display_size), repeat=repeat)
+
+    to_photoimage, photo_error = _photoimage_factory()
+    if to_photoimage is not None:
+        _timed(timings, 'photoimage', to_photoimage, display_image, repeat=repeat)
+    else:
+        timings['photoimage'] = None
+
+    _timed(timings, 'stats', count_pixels_from_histogram, histogram, 127, repeat=repeat)
+    _timed(timings, 'stats_pixels', count_white_pixels, binary_image, repeat=repeat)
+    encoded = _timed(timings, 'encode', cv2.imencode, '.png', binary_image, repeat=repeat)
+
+    packed = _timed(timings, 'pack', PackedBinary.from_binary, binary_image, repeat=repeat)
+    _timed(timings, 'stats_popcount', packed.count_white, repeat=repeat)
+    encoded_1bit = _timed(timings, 'encode_1bit', _encode_1bit_png, packed, repeat=repeat)
+    
+    # 融合引擎（先释放不再需要的灰度图和二值图）
+    del gray_image, binary_image, packed
+    _timed(timings, 'fused', FusedBinarizer(cv2.COLOR_RGB2GRAY).binarize, image, 127, repeat=repeat)
+    if numba_available():
+        fused = FusedBinarizer(cv2.COLOR_RGB2GRAY, backend='numba')
+        fused.binarize(image[:8, :8], 127)  # 内核首次调用时编译，不计入耗时
+        _timed(timings, 'fused_numba', fused.binarize, image, 127, repeat=repeat)
+    else:
+        timings['fused_numba'] = None
+
+    return {
+        'megapixels': megapixels,
+        'width': width,
+        'height': height,
+        'source_format': image_format,
+        'source_bytes': file_size,
+        'encoded_bytes': int(encoded[1].size),
+        'encoded_1bit_bytes': len(encoded_1bit),
+        'binary_bytes': height * width,
+        'packed_bytes': height * ((width + 7) // 8),
+        'baseline_rss': baseline_rss,
+        'peak_rss': peak_rss_bytes(),
+        'photoimage_error': photo_error,
+        'stages': timings,
+    }
+
+
+def _encode_1bit_png(packed):
+    buffer = io.BytesIO()
+    packed.to_pil().save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def environment_info(profile=None):
+    """记录影响结果的环境信息（库版本、CPU、线程数、SIMD 特性和性能配置）"""
+    import PIL
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'pillow': PIL.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+        'opencv_optimized': cv2.useOptimized(),
+        'numba': numba_available(),
+        'simd': hardware_report()['simd'],
+        'profile': profile.to_dict(1) if profile is not None else None,
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES_MP, repeat=3, image_format='.jpg', seed=0, profile=None, log=print):
+    """依次测量各尺寸（每个尺寸一个新的子进程，按 profile 设置线程数），返回完整结果"""
+    profile = profile or PerformanceProfile.from_env()
+    results = []
+    for megapixels in sizes:
+        log(f"测试 {megapixels} MP ...")
+        try:
+            # 每个尺寸使用新进程，峰值内存不受前一个尺寸影响
+            with ProcessPoolExecutor(max_workers=1, **profile.executor_kwargs(1)) as executor:
+                result = executor.submit(benchmark_size, megapixels, repeat, image_format, seed).result()
+        except Exception as e:
+            log(f"  {megapixels} MP 失败: {e}")
+            results.append({'megapixels': megapixels, 'error': str(e)})
+            continue
+
+        results.append(result)
+        stages = ', '.join(f"{name} {timing['median'] * 1000:.1f} ms"
+                           for name, timing in result['stages'].items() if timing is not None)
+        peak = result['peak_rss']
+        log(f"  {result['width']}x{result['height']}: {stages}"
+            + (f", 峰值内存 {peak / 1024 ** 2:.0f} MB" if peak else ""))
+
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'repeat': repeat,
+        'environment': environment_info(profile),
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, tolerance=REGRESSION_TOLERANCE,
+                    min_seconds=REGRESSION_MIN_SECONDS):
+    """比较两次结果中相同尺寸、相同阶段的中位耗时，返回变慢超过 tolerance 的项"""
+    baseline_by_size = {r['megapixels']: r for r in baseline.get('results', []) if 'stages' in r}
+    regressions = []
+    for result in current.get('results', []):
+        old = baseline_by_size.get(result.get('megapixels'))
+        if old is None or 'stages' not in result:
+            continue
+        for name, timing in result['stages'].items():
+            old_timing = old['stages'].get(name)
+            if not timing or not old_timing or old_timing['median'] <= 0:
+                continue
+            ratio = timing['median'] / old_timing['median']
+            if ratio > 1 + tolerance and timing['median'] - old_timing['median'] >= min_seconds:
+                regressions.append({'megapixels': result['megapixels'], 'stage': name,
+                                    'baseline': old_timing['median'], 'current': timing['median'],
+                                    'ratio': ratio})
+    return regressions
+
+
+def write_results(results, file_path):
+    """把结果写为 JSON 文件"""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def load_results(file_path):
+    """读取之前保存的 JSON 结果"""
+    with open(file_path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,514 @@
+"""二值化处理核心：与界面无关的读取、灰度、裁剪、阈值、统计与保存
+
+本模块不依赖 tkinter / PIL.ImageTk，可在批处理服务器上直接导入。
+"""
+import csv
+import os
+
+import cv2
+import numpy as np
+
+from .bitpacked import PackedBinary
+from .history import EditHistory
+from .pyramid import ImagePyramid
+from .result_cache import GRAY_METHOD, GRAY_DECODE_METHOD, result_key, source_digest
+from .thresholds import as_settings, global_threshold, local_binarize
+from .tiled import (is_memmap, should_use_tiled, open_tiled_image, image_size,
+                    gray_and_histogram_tiled, histogram_tiled, binarize_tiled, half_size_tiled)
+
+
+# 可在解码时直接缩小的格式（libjpeg 在 DCT 域按 1/2、1/4、1/8 缩小，远快于完整解码）
+REDUCED_DECODE_EXTENSIONS = ('.jpg', '.jpeg', '.jpe')
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                        (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# 以真正的1位格式写出的扩展名（PNG 为1位灰度，TIFF 使用 CCITT G4 压缩，PBM 为 P4）
+ONE_BIT_EXTENSIONS = ('.png', '.tif', '.tiff', '.pbm')
+
+
+def compute_histogram(gray_image):
+    """计算灰度直方图（256项，整数计数，大图也不会丢失精度）"""
+    return np.bincount(gray_image.ravel(), minlength=256)
+
+
+def count_pixels_from_histogram(histogram, threshold):
+    """根据直方图计算指定阈值下的黑白像素数量（O(256)，不访问像素数据）"""
+    white_pixels = int(histogram[threshold + 1:].sum())
+    black_pixels = int(histogram.sum()) - white_pixels
+    return black_pixels, white_pixels
+
+
+def threshold_sweep(histogram):
+    """一次累加直方图得到全部 256 个阈值下的黑白像素数（阈值 t 时灰度 > t 为白色）
+
+    返回 (黑色像素数, 白色像素数) 两个长度为 256 的 int64 数组，第 t 项对应阈值 t。
+    """
+    black = np.cumsum(histogram, dtype=np.int64)
+    return black, black[-1] - black
+
+
+def write_sweep_csv(file_path, histogram):
+    """把阈值扫描结果写成 CSV：阈值、黑色像素数、白色像素数、黑色占比、白色占比"""
+    black, white = threshold_sweep(histogram)
+    total = max(int(black[-1]), 1)
+    with open(file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['threshold', 'black', 'white', 'black_ratio', 'white_ratio'])
+        for threshold in range(256):
+            writer.writerow([threshold, int(black[threshold]), int(white[threshold]),
+                             f"{black[threshold] / total:.6f}", f"{white[threshold] / total:.6f}"])
+
+
+def count_white_pixels(binary_image, band_rows=4096):
+    """统计二值图中的白色像素数（按行带调用 cv2.countNonZero，大图不整体读入）"""
+    return sum(cv2.countNonZero(binary_image[row:row + band_rows])
+               for row in range(0, binary_image.shape[0], band_rows))
+
+
+def fit_to_canvas(shape, canvas_width, canvas_height):
+    """计算图像适应画布时的显示尺寸（不放大，只缩小）"""
+    img_height, img_width = shape[:2]
+    scale_x = (canvas_width - 20) / img_width
+    scale_y = (canvas_height - 20) / img_height
+    scale = min(scale_x, scale_y, 1.0)
+    return int(img_width * scale), int(img_height * scale)
+
+
+def read_image(file_path, flags=cv2.IMREAD_COLOR):
+    """读取图片（OpenCV 默认的 BGR 通道顺序），读取失败时抛出 ValueError"""
+    image = cv2.imread(file_path, flags)
+    if image is None:
+        raise ValueError("无法读取图片文件！")
+    return image
+
+
+def load_image(file_path):
+    """读取图片并转换为RGB（PIL/界面显示使用的通道顺序，原地转换不额外复制）"""
+    image = read_image(file_path)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+
+
+def read_preview(file_path, min_side):
+    """缩小解码预览图（RGB），缩小后最长边不小于 min_side
+
+    返回 (预览图, 原图尺寸 (宽, 高), 缩小倍数)；不是 JPEG 或图片太小不值得缩小时返回 None。
+    """
+    if not file_path.lower().endswith(REDUCED_DECODE_EXTENSIONS):
+        return None
+    size = image_size(file_path)
+    if size is None:
+        return None
+    for factor, flag in REDUCED_DECODE_FLAGS:
+        if max(size) // factor >= min_side:
+            image = cv2.imread(file_path, flag)
+            if image is None:
+                return None
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image), size, factor
+    return None
+
+
+def load_gray(file_path):
+    """直接解码为灰度图（不生成三通道缓冲区，也不需要再做颜色转换）"""
+    return read_image(file_path, cv2.IMREAD_GRAYSCALE)
+
+
+def open_image(file_path, grayscale=False):
+    """打开图片：超大图片以内存映射分块模式打开，其他图片直接读入内存（RGB）
+
+    grayscale=True 时直接解码为单通道灰度图（只做二值化、不需要彩色时使用）。
+    """
+    if should_use_tiled(file_path):
+        return open_tiled_image(file_path, grayscale=grayscale)
+    return load_gray(file_path) if grayscale else load_image(file_path)
+
+
+def load_display_color(file_path, max_side):
+    """读取仅用于显示的彩色缩小图（最长边不超过 max_side 太多，灰度导入模式下按需调用）
+
+    JPEG 在解码时直接缩小；超大图片与分块模式共用内存映射的解码缓存，逐行带减半后再缩小；
+    其他格式完整解码后缩小，完整的彩色图不会保留。
+    """
+    preview = read_preview(file_path, max_side)
+    if preview is not None:
+        return preview[0]
+    if should_use_tiled(file_path):
+        image = open_tiled_image(file_path)
+        while max(image.shape[:2]) >= 2 * max_side:
+            image = half_size_tiled(image)
+    else:
+        image = load_image(file_path)
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale >= 1:
+        return image
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def to_grayscale(image, code=cv2.COLOR_RGB2GRAY):
+    """转换为灰度图，已是灰度图时直接返回副本"""
+    if len(image.shape) == 2:
+        return image.copy()
+    return cv2.cvtColor(image, code)
+
+
+def gray_and_histogram(image, check=None):
+    """转换灰度图并计算直方图，内存映射的大图逐行带处理
+
+    已是灰度图（灰度导入）时直接使用原数组，不复制。
+    """
+    if is_memmap(image):
+        return gray_and_histogram_tiled(image, check=check)
+    gray_image = image if image.ndim == 2 else to_grayscale(image)
+    if check is not None:
+        check()
+    return gray_image, compute_histogram(gray_image)
+
+
+def binarize(gray_image, threshold, check=None, band_rows=1024):
+    """全局阈值二值化
+
+    传入 check 时按行分块处理，每块之间调用一次 check()（用于后台任务的取消）；
+    内存映射的大图结果同样写入内存映射文件。
+    """
+    if is_memmap(gray_image):
+        return binarize_tiled(gray_image, threshold, check=check)
+    if check is None:
+        _, binary_image = cv2.threshold(gray_image, threshold, 255, cv2.THRESH_BINARY)
+        return binary_image
+
+    binary_image = np.empty_like(gray_image)
+    for row in range(0, gray_image.shape[0], band_rows):
+        check()
+        cv2.threshold(gray_image[row:row + band_rows], threshold, 255, cv2.THRESH_BINARY,
+                      dst=binary_image[row:row + band_rows])
+    return binary_image
+
+
+def binarize_with(gray_image, settings, histogram=None, check=None):
+    """按阈值参数（整数阈值或 ThresholdSettings）二值化
+
+    Otsu/三角法需要直方图，未传入时现算一次；局部模式按行带计算。
+    """
+    settings = as_settings(settings)
+    if not settings.is_global:
+        return local_binarize(gray_image, settings, check=check)
+    if histogram is None and settings.mode != 'global':
+        histogram = (histogram_tiled(gray_image) if is_memmap(gray_image)
+                     else compute_histogram(gray_image))
+    return binarize(gray_image, global_threshold(settings, histogram), check=check)
+
+
+def pack_with(gray_image, settings, histogram=None, check=None):
+    """按阈值参数二值化并按位打包
+
+    全局模式逐行带阈值后直接打包，不生成完整的 uint8 二值图；局部模式先计算再打包。
+    """
+    settings = as_settings(settings)
+    if not settings.is_global:
+        return PackedBinary.from_binary(local_binarize(gray_image, settings, check=check))
+    if histogram is None and settings.mode != 'global':
+        histogram = (histogram_tiled(gray_image) if is_memmap(gray_image)
+                     else compute_histogram(gray_image))
+    return PackedBinary.from_threshold(gray_image, global_threshold(settings, histogram), check=check)
+
+
+def pack_cached(gray_image, settings, histogram=None, cache=None, key=None, check=None, store=True):
+    """与 pack_with 相同，但先查找结果缓存，计算后写入缓存（cache 或 key 为 None 时不使用缓存）
+
+    store=False 时只查找不写入（拖动滑块时的中间阈值不占用磁盘缓存）。
+    """
+    if cache is not None and key is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached.packed
+    packed = pack_with(gray_image, settings, histogram, check=check)
+    if store and cache is not None and key is not None:
+        cache.put(key, packed, histogram)
+    return packed
+
+
+def write_binary(file_path, binary_image):
+    """写出二值图：PNG/TIFF/PBM 以1位格式直接由打包数据写出，其他格式解包后用 OpenCV 写出
+
+    binary_image 可以是 PackedBinary 或 0/255 的 uint8 数组。
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in ONE_BIT_EXTENSIONS:
+        if isinstance(binary_image, PackedBinary):
+            binary_image = binary_image.unpack()
+        write_image(file_path, binary_image)
+        return
+
+    if not isinstance(binary_image, PackedBinary):
+        binary_image = PackedBinary.from_binary(binary_image)
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    options = {'compression': 'group4'} if extension in ('.tif', '.tiff') else {}
+    try:
+        binary_image.to_pil().save(file_path, **options)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"无法写入图片文件: {file_path}（{e}）")
+
+
+def write_image(file_path, image):
+    """写出图片，失败时抛出 ValueError"""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    if not cv2.imwrite(file_path, image):
+        raise ValueError(f"无法写入图片文件: {file_path}")
+
+
+class BinarizationPipeline:
+    """单张图像的二值化处理流程：load → to_gray → (crop) → threshold → stats / save
+
+    original 为 RGB 顺序（与界面显示一致），grayscale 与 histogram 在 to_gray 时生成，
+    全分辨率二值化结果按阈值参数缓存（按位打包，内存为 uint8 的1/8），只有保存或显式请求时才计算。
+    阈值参数可以是整数（全局手动阈值）或 ThresholdSettings（Otsu、三角法、局部阈值等）。
+    设置 result_cache（ResultCache）后，从文件读取的图像的二值化结果按内容哈希缓存到磁盘。
+    """
+
+    def __init__(self, result_cache=None):
+        self.result_cache = result_cache
+        self.source_digest = None  # 原图文件的内容哈希（直接传入数组时为 None）
+        self.source_path = None
+        self.gray_method = GRAY_METHOD  # 灰度导入时为 GRAY_DECODE_METHOD（结果缓存键的一部分）
+        self.original = None
+        self.history = None  # 编辑历史（裁剪只记录 ROI，恢复/撤销不复制像素）
+        self.grayscale = None
+        self.histogram = None
+        self.binary = None
+        self.binary_key = None
+        self._pyramids = {}  # 'original' / 'grayscale' -> ImagePyramid
+
+    @property
+    def shape(self):
+        """当前原图的形状"""
+        return None if self.original is None else self.original.shape
+
+    def reset_results(self):
+        """清除灰度及二值化结果"""
+        self._pyramids.clear()
+        self.grayscale = None
+        self.histogram = None
+        self.binary = None
+        self.binary_key = None
+
+    def load(self, file_path, grayscale=False):
+        """读取图片并转换为RGB（超大图片以内存映射方式打开）
+
+        grayscale=True 时直接解码为灰度图，原图即灰度图，to_gray 不再需要颜色转换；
+        彩色图只在显示时通过 color_preview 按需读取。
+        """
+        digest = source_digest(file_path) if self.result_cache is not None else None
+        self.set_image(open_image(file_path, grayscale), digest, file_path, grayscale)
+        return self.original
+
+    def set_image(self, image, digest=None, source_path=None, gray_decoded=False):
+        """直接使用已有的RGB/灰度数组作为原图（开始新的编辑历史）
+
+        digest 为图像来源文件的内容哈希，用于结果缓存的键；
+        gray_decoded 表示图像是直接解码为灰度的（JPEG 与 RGB→GRAY 转换的结果有细微差异）。
+        """
+        self.source_digest = digest
+        self.source_path = source_path
+        self.gray_method = GRAY_DECODE_METHOD if gray_decoded else GRAY_METHOD
+        self.history = EditHistory(image)
+        self.original = self.history.image
+        self.reset_results()
+
+    def to_gray(self):
+        """转换为灰度图并缓存直方图"""
+        if self.original is None:
+            raise ValueError("请先导入图片！")
+
+        # 只统计一次直方图，之后任意阈值的像素统计都基于它
+        self.set_grayscale(*gray_and_histogram(self.original))
+        return self.grayscale
+
+    def set_grayscale(self, gray_image, histogram):
+        """使用已计算好的灰度图和直方图（后台线程计算后在界面线程提交）"""
+        self._pyramids.pop('grayscale', None)
+        self.grayscale = gray_image
+        self.histogram = histogram
+        self.binary = None
+        self.binary_key = None
+
+    def pyramid(self, name):
+        """返回原图（'original'）或灰度图（'grayscale'）的预览金字塔，按需创建
+
+        灰度导入时灰度图就是原图，两者共用原图的金字塔。
+        """
+        image = getattr(self, name)
+        if image is None:
+            return None
+        if name == 'grayscale' and image is self.original:
+            return self.pyramid('original')
+        pyramid = self._pyramids.get(name)
+        if pyramid is None or pyramid.base is not image:
+            pyramid = ImagePyramid(image)
+            self._pyramids[name] = pyramid
+        return pyramid
+
+    def pyramid_for(self, image):
+        """若 image 是当前原图或灰度图，返回其金字塔，否则返回 None"""
+        for name in ('original', 'grayscale'):
+            if image is not None and image is getattr(self, name):
+                return self.pyramid(name)
+        return None
+
+    def adopt_pyramid(self, name, pyramid):
+        """使用后台预先生成好的金字塔（须基于当前图像）"""
+        if pyramid is not None and pyramid.base is getattr(self, name):
+            self._pyramids[name] = pyramid
+
+    def crop(self, x1, y1, x2, y2, min_size=10):
+        """按原图坐标裁剪（坐标会被限制在图像范围内）"""
+        if self.original is None:
+            raise ValueError("请先导入图片！")
+
+        # 确保坐标顺序正确
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+
+        # 确保坐标在图像范围内
+        img_height, img_width = self.original.shape[:2]
+        x1 = max(0, min(x1, img_width - 1))
+        y1 = max(0, min(y1, img_height - 1))
+        x2 = max(0, min(x2, img_width))
+        y2 = max(0, min(y2, img_height))
+
+        # 检查裁剪区域大小
+        if x2 - x1 < min_size or y2 - y1 < min_size:
+            raise ValueError("裁剪区域太小！")
+
+        return self._apply_history(self.history.push_crop(x1, y1, x2, y2))
+
+    def restore(self):
+        """恢复导入时的原图"""
+        if self.history is None:
+            raise ValueError("没有可恢复的原图！")
+
+        return self._apply_history(self.history.restore())
+
+    @property
+    def can_undo(self):
+        return self.history is not None and self.history.can_undo
+
+    @property
+    def can_redo(self):
+        return self.history is not None and self.history.can_redo
+
+    def undo(self):
+        """撤销上一次编辑"""
+        if not self.can_undo:
+            raise ValueError("没有可撤销的操作！")
+
+        return self._apply_history(self.history.undo())
+
+    def redo(self):
+        """重做被撤销的编辑"""
+        if not self.can_redo:
+            raise ValueError("没有可重做的操作！")
+
+        return self._apply_history(self.history.redo())
+
+    def _apply_history(self, image):
+        self.original = image
+        self.reset_results()
+        return self.original
+
+    def effective_threshold(self, settings):
+        """全局模式下实际使用的阈值（Otsu/三角法由缓存的直方图求出），局部模式返回 None"""
+        settings = as_settings(settings)
+        if not settings.is_global:
+            return None
+        if self.histogram is None:
+            raise ValueError("请先转换为灰度图！")
+        return global_threshold(settings, self.histogram)
+
+    def has_binary(self, settings):
+        """是否已缓存该阈值参数下的全分辨率结果"""
+        return self.binary is not None and self.binary_key == as_settings(settings).key()
+
+    def cache_key(self, settings):
+        """当前图像（原图上的裁剪区域）在该阈值参数下的结果缓存键，无法缓存时返回 None"""
+        if self.result_cache is None or self.source_digest is None or self.history is None:
+            return None
+        return result_key(self.source_digest, self.roi, settings, self.gray_method)
+
+    @property
+    def roi(self):
+        """当前图像在导入原图上的裁剪区域 (x, y, 宽, 高)，未裁剪时为 None"""
+        if self.history is None or self.history.current.is_full:
+            return None
+        return self.history.current.roi
+
+    @property
+    def is_unedited(self):
+        """当前图像是否就是导入时的原图（未裁剪、未编辑）"""
+        return self.history is not None and self.history.current.is_full
+
+    def color_preview(self, max_side):
+        """灰度导入时读取彩色缩小图用于显示；不是灰度导入或已裁剪时返回 None"""
+        if self.source_path is None or self.gray_method != GRAY_DECODE_METHOD or not self.is_unedited:
+            return None
+        return load_display_color(self.source_path, max_side)
+
+    def packed(self, settings):
+        """按阈值参数计算按位打包的全分辨率二值化结果（参数不变时直接返回缓存结果）"""
+        if self.grayscale is None:
+            raise ValueError("请先转换为灰度图！")
+
+        if not self.has_binary(settings):
+            self.set_binary(pack_cached(self.grayscale, settings, self.histogram,
+                                        self.result_cache, self.cache_key(settings)), settings)
+        return self.binary
+
+    def threshold(self, settings):
+        """按阈值参数计算全分辨率二值化图像（0/255 的 uint8 数组，供显示使用）
+
+        全局模式直接阈值，不经过打包/解包，也不写入结果缓存（比解包已有结果更快）；
+        局部模式已有同一参数的打包结果时解包复用。导出和缓存使用 packed()。
+        """
+        if self.grayscale is None:
+            raise ValueError("请先转换为灰度图！")
+        if not as_settings(settings).is_global and self.has_binary(settings):
+            return self.binary.unpack()
+        return binarize_with(self.grayscale, settings, self.histogram)
+
+    def set_binary(self, binary_image, settings):
+        """使用已计算好的全分辨率二值化结果（PackedBinary 或 uint8 数组，须基于当前灰度图）"""
+        if not isinstance(binary_image, PackedBinary):
+            binary_image = PackedBinary.from_binary(binary_image)
+        self.binary = binary_image
+        self.binary_key = as_settings(settings).key()
+
+    def stats(self, settings):
+        """返回指定阈值参数下的黑白像素统计
+
+        全局模式基于直方图，不访问像素数据；局部模式在打包的全分辨率结果上 popcount。
+        """
+        if self.histogram is None:
+            raise ValueError("请先转换为灰度图！")
+
+        threshold = self.effective_threshold(settings)
+        if threshold is not None:
+            black_pixels, white_pixels = count_pixels_from_histogram(self.histogram, threshold)
+        else:
+            total = int(self.histogram.sum())
+            white_pixels = self.packed(settings).count_white()
+            black_pixels = total - white_pixels
+        total_pixels = black_pixels + white_pixels
+        return {
+            'black': black_pixels,
+            'white': white_pixels,
+            'total': total_pixels,
+            'black_ratio': black_pixels / total_pixels if total_pixels else 0.0,
+            'white_ratio': white_pixels / total_pixels if total_pixels else 0.0,
+        }
+
+    def save(self, file_path, settings):
+        """保存指定阈值参数下的全分辨率二值化结果（PNG/TIFF/PBM 为1位格式）"""
+        write_binary(file_path, self.packed(settings))
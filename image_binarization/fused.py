@@ -0,0 +1,221 @@
+"""融合引擎：彩色图一次遍历直接得到按位打包的二值图和黑白像素数
+
+标准流程依次生成完整的灰度图、完整的 0/255 二值图再打包和统计，每个中间结果都要整幅写出再读回；
+融合引擎按缓存大小的行块处理，每块在预先分配的小缓冲区中完成灰度、阈值、打包和计数，
+整幅图像只读一次彩色数据、写一次打包结果。
+默认每块依次调用 cvtColor/threshold/packbits（OpenCV 的 SIMD 实现，缓冲区都留在缓存中）；
+安装了 numba 时可改用编译的逐像素内核（灰度与 OpenCV 的 BT.601 定点公式逐位一致），
+它不需要行块缓冲区，但标量代码比 OpenCV 的 SIMD 路径慢，因此只在明确选择时使用。
+Otsu/三角法需要先有直方图，多一次只读不写的遍历；局部阈值需要邻域，仍使用标准流程。
+"""
+import cv2
+import numpy as np
+
+from .binarization_core import compute_histogram, pack_with, to_grayscale
+from .bitpacked import POPCOUNT_TABLE, PackedBinary
+from .thresholds import as_settings, global_threshold
+from .tiled import iter_row_bands
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# 批处理可选的引擎：标准流程、融合引擎（OpenCV 行块）、融合引擎（numba 内核）
+ENGINES = ('standard', 'fused', 'fused-numba')
+
+# 融合引擎的实现
+BACKENDS = ('opencv', 'numba')
+
+# 每个行块的目标字节数（彩色输入），与常见的 L2 缓存大小相当
+BLOCK_BYTES = 256 * 1024
+
+# OpenCV 8位 RGB→GRAY 的定点系数（15位）
+GRAY_SHIFT = 15
+GRAY_RED, GRAY_GREEN, GRAY_BLUE = 9798, 19235, 3735
+
+
+def numba_available():
+    return numba is not None
+
+
+def engine_backend(engine):
+    """引擎名对应的融合引擎实现（标准流程返回 None）"""
+    if engine == 'standard':
+        return None
+    if engine == 'fused':
+        return 'opencv'
+    if engine == 'fused-numba':
+        return 'numba'
+    raise ValueError(f"未知的处理引擎: {engine}")
+
+
+def block_rows_for(image, block_bytes=BLOCK_BYTES):
+    """每个行块的行数：一块彩色数据约为 block_bytes"""
+    row_bytes = image.shape[1] * (image.shape[2] if image.ndim == 3 else 1)
+    return max(1, min(image.shape[0], block_bytes // max(row_bytes, 1)))
+
+
+def _channel_indices(code):
+    """返回 (红色通道, 蓝色通道) 的索引"""
+    if code in (cv2.COLOR_BGR2GRAY, cv2.COLOR_BGRA2GRAY):
+        return 2, 0
+    if code in (cv2.COLOR_RGB2GRAY, cv2.COLOR_RGBA2GRAY):
+        return 0, 2
+    raise ValueError(f"融合引擎不支持的颜色转换: {code}")
+
+
+if numba is not None:
+    @numba.njit(cache=True, nogil=True, inline='always')
+    def _weighted(row, x, red, blue):
+        """灰度的定点加权和（右移 GRAY_SHIFT 位并四舍五入即为灰度）"""
+        return (np.int32(row[x, red]) * GRAY_RED + np.int32(row[x, 1]) * GRAY_GREEN
+                + np.int32(row[x, blue]) * GRAY_BLUE)
+
+    @numba.njit(cache=True, nogil=True)
+    def _threshold_pack_block(block, threshold, red, blue, bits, popcount_table,
+                              histogram, with_histogram):
+        """一块彩色像素 → 打包的二值位，返回白色像素数（可同时累加灰度直方图）"""
+        height, width = block.shape[0], block.shape[1]
+        half = 1 << (GRAY_SHIFT - 1)
+        # 灰度 > 阈值 等价于 加权和 >= ((阈值 + 1) << GRAY_SHIFT) - half，省去逐像素的移位
+        limit = ((threshold + 1) << GRAY_SHIFT) - half
+        full = width // 8
+        white = 0
+        for y in range(height):
+            row = block[y]
+            out = bits[y]
+            # 完整的字节固定循环8次（便于编译器展开），行尾不足8个像素的部分单独处理
+            for byte in range(full):
+                value = 0
+                for bit in range(8):
+                    acc = _weighted(row, byte * 8 + bit, red, blue)
+                    if with_histogram:
+                        histogram[(acc + half) >> GRAY_SHIFT] += 1
+                    value = (value << 1) | (acc >= limit)
+                out[byte] = value
+                white += popcount_table[value]
+            if full * 8 < width:
+                value = 0
+                for x in range(full * 8, width):
+                    acc = _weighted(row, x, red, blue)
+                    if with_histogram:
+                        histogram[(acc + half) >> GRAY_SHIFT] += 1
+                    value = (value << 1) | (acc >= limit)
+                value <<= 8 - (width - full * 8)
+                out[full] = value
+                white += popcount_table[value]
+        return white
+
+    @numba.njit(cache=True, nogil=True)
+    def _histogram_block(block, red, blue, histogram):
+        """一块彩色像素的灰度直方图（不写出灰度图）"""
+        half = 1 << (GRAY_SHIFT - 1)
+        for y in range(block.shape[0]):
+            row = block[y]
+            for x in range(block.shape[1]):
+                histogram[(_weighted(row, x, red, blue) + half) >> GRAY_SHIFT] += 1
+
+
+class FusedBinarizer:
+    """按行块融合灰度、阈值、打包和计数；缓冲区按图像宽度预先分配，同尺寸的图像可重复使用
+
+    backend 为 'opencv'（默认）或 'numba'；选择 numba 但未安装时抛出 ValueError。
+    """
+
+    def __init__(self, code=cv2.COLOR_BGR2GRAY, block_bytes=BLOCK_BYTES, backend='opencv'):
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的融合引擎实现: {backend}")
+        if backend == 'numba' and numba is None:
+            raise ValueError("未安装 numba，无法使用 numba 内核")
+        self.code = code
+        self.backend = backend
+        self.red, self.blue = _channel_indices(code)
+        self.block_bytes = block_bytes
+        self._scratch_key = None
+        self._gray = None
+        self._binary = None
+        self._no_histogram = np.zeros(256, dtype=np.int64)
+
+    def _scratch(self, rows, width):
+        """行块大小的灰度/二值缓冲区（尺寸不变时重复使用）"""
+        if self._scratch_key != (rows, width):
+            self._gray = np.empty((rows, width), dtype=np.uint8)
+            self._binary = np.empty((rows, width), dtype=np.uint8)
+            self._scratch_key = (rows, width)
+        return self._gray, self._binary
+
+    def histogram(self, image, check=None):
+        """彩色图的灰度直方图（逐块计算，不生成完整的灰度图）"""
+        histogram = np.zeros(256, dtype=np.int64)
+        rows = block_rows_for(image, self.block_bytes)
+        gray_scratch, _ = self._scratch(rows, image.shape[1])
+        for start, end in iter_row_bands(image.shape[0], rows):
+            if check is not None:
+                check()
+            if self.backend == 'numba':
+                _histogram_block(np.asarray(image[start:end]), self.red, self.blue, histogram)
+            else:
+                gray = gray_scratch[:end - start]
+                cv2.cvtColor(image[start:end], self.code, dst=gray)
+                histogram += np.bincount(gray.ravel(), minlength=256)
+        return histogram
+
+    def threshold(self, image, threshold, with_histogram=False, check=None):
+        """按全局阈值二值化，返回 (PackedBinary, 白色像素数, 直方图或 None)"""
+        packed = PackedBinary.empty_like(image)
+        histogram = np.zeros(256, dtype=np.int64) if with_histogram else None
+        rows = block_rows_for(image, self.block_bytes)
+        gray_scratch, binary_scratch = self._scratch(rows, image.shape[1])
+        white = 0
+        for start, end in iter_row_bands(image.shape[0], rows):
+            if check is not None:
+                check()
+            block = image[start:end]
+            if self.backend == 'numba':
+                # 内存映射的输入/输出以普通数组视图传入编译的内核
+                white += _threshold_pack_block(np.asarray(block), threshold, self.red, self.blue,
+                                               np.asarray(packed.bits[start:end]), POPCOUNT_TABLE,
+                                               histogram if with_histogram else self._no_histogram,
+                                               with_histogram)
+                continue
+            gray = gray_scratch[:end - start]
+            binary = binary_scratch[:end - start]
+            cv2.cvtColor(block, self.code, dst=gray)
+            if with_histogram:
+                histogram += np.bincount(gray.ravel(), minlength=256)
+            cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY, dst=binary)
+            white += cv2.countNonZero(binary)
+            packed.bits[start:end] = np.packbits(binary, axis=1)
+        return packed, white, histogram
+
+    def binarize(self, image, settings, with_histogram=False, check=None):
+        """按阈值参数二值化，返回 (PackedBinary, 统计, 直方图或 None)
+
+        统计为 {'black', 'white', 'total'}；with_histogram=True 时同时返回灰度直方图（写入结果缓存用）。
+        灰度输入（灰度导入）直接逐行带阈值打包；局部阈值模式使用标准流程。
+        """
+        settings = as_settings(settings)
+        total = image.shape[0] * image.shape[1]
+        if image.ndim == 2 or not settings.is_global:
+            gray_image = image if image.ndim == 2 else to_grayscale(image, self.code)
+            histogram = None
+            if with_histogram or settings.mode in ('otsu', 'triangle'):
+                histogram = compute_histogram(gray_image)
+            packed = pack_with(gray_image, settings, histogram, check=check)
+            white = packed.count_white()
+        else:
+            histogram = None
+            if settings.mode != 'global':
+                histogram = self.histogram(image, check=check)
+            packed, white, block_histogram = self.threshold(
+                image, global_threshold(settings, histogram), with_histogram and histogram is None, check=check)
+            histogram = histogram if histogram is not None else block_histogram
+        stats = {'black': total - white, 'white': white, 'total': total}
+        return packed, stats, histogram if with_histogram else None
+
+
+def fused_binarize(image, settings, code=cv2.COLOR_BGR2GRAY, with_histogram=False, check=None,
+                   backend='opencv'):
+    """融合引擎的便捷函数，参见 FusedBinarizer.binarize"""
+    return FusedBinarizer(code, backend=backend).binarize(image, settings, with_histogram, check)
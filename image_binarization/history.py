@@ -0,0 +1,91 @@
+"""编辑历史：裁剪以 ROI 描述符记录在共享的原图缓冲区上，支持多级撤销/重做
+
+每个历史状态只保存 (缓冲区, ROI)，裁剪、恢复、撤销和重做都只是切换到同一缓冲区上的
+另一个视图，不复制像素数据。
+"""
+
+
+class EditState:
+    """历史状态：缓冲区及其上的 ROI（x, y, 宽, 高）"""
+
+    def __init__(self, buffer, roi=None):
+        self.buffer = buffer
+        height, width = buffer.shape[:2]
+        self.roi = roi if roi is not None else (0, 0, width, height)
+        self._view = None
+
+    @property
+    def image(self):
+        """当前 ROI 对应的视图（同一状态始终返回同一个视图对象）"""
+        if self._view is None:
+            if self.is_full:
+                self._view = self.buffer
+            else:
+                x, y, width, height = self.roi
+                self._view = self.buffer[y:y + height, x:x + width]
+        return self._view
+
+    @property
+    def is_full(self):
+        """ROI 是否覆盖整个缓冲区"""
+        height, width = self.buffer.shape[:2]
+        return self.roi == (0, 0, width, height)
+
+
+class EditHistory:
+    """撤销/重做栈"""
+
+    def __init__(self, image, max_states=100):
+        self.max_states = max_states
+        self.origin = image  # 导入时的原图缓冲区（历史记录被截断时也保留）
+        self._states = [EditState(image)]
+        self._index = 0
+
+    @property
+    def current(self):
+        return self._states[self._index]
+
+    @property
+    def image(self):
+        """当前状态下的图像（视图）"""
+        return self.current.image
+
+    @property
+    def can_undo(self):
+        return self._index > 0
+
+    @property
+    def can_redo(self):
+        return self._index < len(self._states) - 1
+
+    def _push(self, state):
+        # 新编辑会丢弃当前位置之后的重做记录
+        del self._states[self._index + 1:]
+        self._states.append(state)
+        if len(self._states) > self.max_states:
+            del self._states[0]
+        self._index = len(self._states) - 1
+        return state.image
+
+    def push_crop(self, x1, y1, x2, y2):
+        """在当前图像坐标系下裁剪（只记录 ROI，不复制像素）"""
+        state = self.current
+        x, y = state.roi[:2]
+        return self._push(EditState(state.buffer, (x + x1, y + y1, x2 - x1, y2 - y1)))
+
+    def restore(self):
+        """恢复为导入时的原图（作为一次可撤销的编辑，不复制像素）"""
+        state = self.current
+        if not state.is_full:
+            self._push(EditState(self.origin))
+        return self.image
+
+    def undo(self):
+        if self.can_undo:
+            self._index -= 1
+        return self.image
+
+    def redo(self):
+        if self.can_redo:
+            self._index += 1
+        return self.image
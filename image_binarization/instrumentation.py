@@ -0,0 +1,153 @@
+"""可选的性能插桩：热点阶段计时、事件计数、内存采样和 Chrome 跟踪文件导出
+
+关闭时 span() 返回一个共享的空上下文，几乎没有开销；
+开启跟踪后每个计时区间记录为一个 Chrome trace 事件（chrome://tracing 或 Perfetto 可直接打开）。
+计时可以在后台线程中进行，统计数据由锁保护。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from ._memory import current_rss_bytes
+
+# 设置该环境变量为跟踪文件路径时，启动即开启插桩，并在退出时写出跟踪文件
+TRACE_ENV = 'IMAGE_BINARIZATION_TRACE'
+
+# 计算 p95 等统计量时保留的最近样本数
+STATS_WINDOW = 120
+
+# 内存中最多保留的跟踪事件数（超出后丢弃最早的事件）
+MAX_TRACE_EVENTS = 200_000
+
+_NULL_SPAN = nullcontext()
+
+
+class StageStats:
+    """单个阶段的耗时统计（秒）"""
+
+    def __init__(self, window=STATS_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.last = duration
+        self.max = max(self.max, duration)
+        self.recent.append(duration)
+
+    def to_dict(self):
+        recent = sorted(self.recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {
+            'count': self.count,
+            'last': self.last,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p95': p95,
+            'max': self.max,
+        }
+
+
+class _Span:
+    def __init__(self, instrumentation, name, args):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.name, self.start, time.perf_counter() - self.start, self.args)
+        return False
+
+
+class Instrumentation:
+    """计时器与计数器的集合"""
+
+    def __init__(self, enabled=False, tracing=False, max_events=MAX_TRACE_EVENTS):
+        self.enabled = enabled
+        self.tracing = tracing
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._counters = {}
+        self._events = deque(maxlen=max_events)
+        self._origin = time.perf_counter()
+
+    def span(self, name, **args):
+        """计时上下文：with instrumentation.span('threshold'): ..."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def record(self, name, start, duration, args=None):
+        """记录一个已完成的计时区间（start 为 time.perf_counter() 时间）"""
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = StageStats()
+            stats.add(duration)
+        if self.tracing:
+            event = {'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                     'ts': (start - self._origin) * 1e6, 'dur': duration * 1e6}
+            if args:
+                event['args'] = args
+            self._events.append(event)
+
+    def count(self, name, amount=1):
+        """累加计数器"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def sample(self, name, value):
+        """记录一个数值采样（跟踪文件中显示为计数曲线，例如内存占用）"""
+        if self.enabled and self.tracing:
+            self._events.append({'name': name, 'ph': 'C', 'pid': os.getpid(),
+                                 'ts': (time.perf_counter() - self._origin) * 1e6,
+                                 'args': {name: value}})
+
+    def stats(self, name):
+        """某阶段的统计（count/last/mean/p95/max，单位秒），没有数据时返回 None"""
+        with self._lock:
+            stats = self._stats.get(name)
+            return None if stats is None else stats.to_dict()
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def summary(self):
+        """所有阶段统计和计数器"""
+        with self._lock:
+            return {
+                'stages': {name: stats.to_dict() for name, stats in self._stats.items()},
+                'counters': dict(self._counters),
+            }
+
+    def reset(self):
+        """清空统计、计数器和跟踪事件"""
+        with self._lock:
+            self._stats.clear()
+            self._counters.clear()
+            self._events.clear()
+            self._origin = time.perf_counter()
+
+    def write_trace(self, file_path):
+        """写出 Chrome trace JSON（附带当前统计摘要），返回事件数"""
+        events = list(self._events)
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                       'otherData': self.summary()}, f, ensure_ascii=False)
+        return len(events)
@@ -0,0 +1,246 @@
+"""运行时性能配置：工作进程的 OpenCV/BLAS 线程数、CPU 亲和性，以及启动时的 SIMD 报告
+
+OpenCV 和 NumPy 链接的 BLAS/OpenMP 默认各自开与核数相同的线程。多进程批处理时，
+进程数 × 线程数远超核数，线程互相抢占反而更慢。
+性能配置在每个工作进程启动时（进程池的 initializer）设置 OpenCV 线程数（默认为核数 / 进程数）
+和是否启用优化代码路径，还可以把每个进程绑定到互不重叠的一组核上（仅 Linux）。
+BLAS/OpenMP 的线程数只能在库加载前用环境变量设置，因此在创建进程池前写入环境变量，
+需要时以 spawn 方式启动工作进程，使其重新加载库时读取这些变量。
+各参数都可以用环境变量或命令行参数指定（命令行优先）。
+"""
+import multiprocessing
+import os
+
+import cv2
+
+# 环境变量
+CV_THREADS_ENV = 'IMAGE_BINARIZATION_CV_THREADS'
+BLAS_THREADS_ENV = 'IMAGE_BINARIZATION_BLAS_THREADS'
+OPTIMIZED_ENV = 'IMAGE_BINARIZATION_CV_OPTIMIZED'
+AFFINITY_ENV = 'IMAGE_BINARIZATION_AFFINITY'
+
+# NumPy 可能链接的 BLAS/OpenMP 实现读取的线程数环境变量
+BLAS_THREAD_VARS = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS')
+
+
+def blas_env():
+    """当前的 BLAS/OpenMP 线程数环境变量"""
+    return tuple(os.environ.get(name) for name in BLAS_THREAD_VARS)
+
+
+# 本模块导入时（NumPy 已随 cv2 加载）的 BLAS 线程数环境变量，fork 出的子进程沿用按此初始化的线程池
+LOADED_BLAS_ENV = blas_env()
+
+# cv2.checkHardwareSupport 的特性编号（即 OpenCV 的 CV_CPU_*，Python 绑定没有导出这些常量）
+CPU_FEATURES = (
+    ('SSE2', 3), ('SSE3', 4), ('SSSE3', 5), ('SSE4.1', 6), ('SSE4.2', 7), ('POPCNT', 8),
+    ('FP16', 9), ('AVX', 10), ('AVX2', 11), ('FMA3', 12),
+    ('AVX512F', 13), ('AVX512BW', 14), ('AVX512CD', 15), ('AVX512DQ', 16), ('AVX512VL', 21),
+    ('NEON', 100), ('VSX', 200), ('VSX3', 201),
+)
+
+
+def available_cpus():
+    """当前进程可以使用的 CPU 编号（受 taskset/cgroup 限制时少于核数）"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(text):
+    """解析 CPU 列表，如 '0-3,8,10-11'"""
+    cpus = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        try:
+            first, last = int(first), int(last or first)
+        except ValueError:
+            raise ValueError(f"无法解析的 CPU 列表: {text}")
+        if first < 0 or last < first:
+            raise ValueError(f"无法解析的 CPU 列表: {text}")
+        cpus.extend(range(first, last + 1))
+    if not cpus:
+        raise ValueError(f"无法解析的 CPU 列表: {text}")
+    return sorted(set(cpus))
+
+
+def parse_threads(text):
+    """线程数：'auto' 或非负整数（OpenCV 中0表示不使用多线程）"""
+    if text is None or str(text).strip().lower() == 'auto':
+        return 'auto'
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError(f"线程数应为 auto 或非负整数: {text}")
+    if value < 0:
+        raise ValueError(f"线程数应为 auto 或非负整数: {text}")
+    return value
+
+
+def parse_affinity(text):
+    """CPU 亲和性：'none'（不绑定）、'auto'（可用的核平均分给各进程）或 CPU 列表"""
+    if text is None or str(text).strip().lower() in ('', 'none', 'off'):
+        return None
+    if str(text).strip().lower() == 'auto':
+        return 'auto'
+    return parse_cpu_list(str(text))
+
+
+def parse_flag(text):
+    return str(text).strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def split_cpus(cpus, workers):
+    """把 CPU 平均分成 workers 组（核数少于进程数时每个进程一个核，轮流共用）"""
+    workers = max(1, workers)
+    if len(cpus) <= workers:
+        return [[cpu] for cpu in cpus]
+    per_worker, extra = divmod(len(cpus), workers)
+    groups = []
+    start = 0
+    for index in range(workers):
+        end = start + per_worker + (1 if index < extra else 0)
+        groups.append(cpus[start:end])
+        start = end
+    return groups
+
+
+def configure_worker(cv_threads, optimized, cpu_groups=None, counter=None):
+    """在工作进程中应用性能配置（进程池的 initializer）"""
+    cv2.setUseOptimized(optimized)
+    cv2.setNumThreads(cv_threads)
+    if cpu_groups and counter is not None and hasattr(os, 'sched_setaffinity'):
+        with counter.get_lock():
+            slot = counter.value
+            counter.value += 1
+        try:
+            os.sched_setaffinity(0, cpu_groups[slot % len(cpu_groups)])
+        except OSError as e:
+            # 绑定失败（核已被 cgroup 移除等）不影响处理
+            print(f"设置 CPU 亲和性时发生错误: {str(e)}")
+
+
+class PerformanceProfile:
+    """工作进程的性能配置
+
+    cv_threads / blas_threads 为 'auto'（核数 / 进程数）或整数；
+    affinity 为 None（不绑定）、'auto' 或 CPU 列表（平均分给各进程）。
+    """
+
+    def __init__(self, cv_threads='auto', blas_threads='auto', optimized=True, affinity=None):
+        self.cv_threads = cv_threads
+        self.blas_threads = blas_threads
+        self.optimized = optimized
+        self.affinity = affinity
+
+    @classmethod
+    def from_env(cls, environ=None):
+        """由环境变量构造（未设置的项使用默认值）"""
+        environ = os.environ if environ is None else environ
+        return cls(cv_threads=parse_threads(environ.get(CV_THREADS_ENV)),
+                   blas_threads=parse_threads(environ.get(BLAS_THREADS_ENV)),
+                   optimized=parse_flag(environ.get(OPTIMIZED_ENV, '1')),
+                   affinity=parse_affinity(environ.get(AFFINITY_ENV)))
+
+    def apply(self, workers=1):
+        """在当前进程中应用（不绑定 CPU），用于命令行主进程和单进程的场合"""
+        configure_worker(self.threads_for(self.cv_threads, workers), self.optimized)
+
+    def cpu_groups(self, workers):
+        """每个进程绑定的 CPU（不绑定时返回 None）"""
+        if self.affinity is None or not hasattr(os, 'sched_setaffinity'):
+            return None
+        cpus = available_cpus() if self.affinity == 'auto' else self.affinity
+        return split_cpus(cpus, workers)
+
+    def threads_for(self, value, workers):
+        """每个进程的线程数：'auto' 时为该进程可用的核数（绑定时为所绑定的核数）"""
+        if value != 'auto':
+            return value
+        groups = self.cpu_groups(workers)
+        if groups:
+            return len(groups[0])
+        return max(1, len(available_cpus()) // max(1, workers))
+
+    def export_blas_threads(self, workers):
+        """写入 BLAS/OpenMP 线程数环境变量，由之后创建的子进程继承
+
+        'auto' 时不覆盖用户已设置的值；当前进程已加载的库不受影响。
+        """
+        threads = str(self.threads_for(self.blas_threads, workers))
+        for name in BLAS_THREAD_VARS:
+            if self.blas_threads == 'auto':
+                os.environ.setdefault(name, threads)
+            else:
+                os.environ[name] = threads
+
+    def executor_kwargs(self, workers, mp_context=None):
+        """创建进程池所需的参数（initializer/initargs），同时导出 BLAS 线程数
+
+        fork 出的子进程直接继承父进程已初始化的 BLAS 线程池，新的环境变量不起作用，
+        因此 BLAS 线程数与当前进程加载库时不同且未指定启动方式时改用 spawn，
+        子进程重新加载 NumPy 时读取环境变量（forkserver 的服务进程只在首次使用时读取环境变量，不适用）。
+        """
+        self.export_blas_threads(workers)
+        context = mp_context
+        if (context is None and blas_env() != LOADED_BLAS_ENV
+                and multiprocessing.get_start_method() == 'fork'):
+            context = multiprocessing.get_context('spawn')
+        context = context or multiprocessing.get_context()
+        groups = self.cpu_groups(workers)
+        counter = context.Value('i', 0) if groups else None
+        return {
+            'mp_context': context,
+            'initializer': configure_worker,
+            'initargs': (self.threads_for(self.cv_threads, workers), self.optimized, groups, counter),
+        }
+
+    def describe(self, workers):
+        """一行说明：进程数、每个进程的线程数、优化代码路径和亲和性"""
+        groups = self.cpu_groups(workers)
+        affinity = '不绑定' if not groups else ' | '.join(
+            ','.join(str(cpu) for cpu in group) for group in groups)
+        return (f"{workers} 个进程，每个进程 OpenCV {self.threads_for(self.cv_threads, workers)} 线程、"
+                f"BLAS {self.threads_for(self.blas_threads, workers)} 线程，"
+                f"优化代码路径{'开启' if self.optimized else '关闭'}，CPU 亲和性: {affinity}")
+
+    def to_dict(self, workers):
+        return {
+            'workers': workers,
+            'cv_threads': self.threads_for(self.cv_threads, workers),
+            'blas_threads': self.threads_for(self.blas_threads, workers),
+            'optimized': self.optimized,
+            'cpu_groups': self.cpu_groups(workers),
+        }
+
+
+def simd_features():
+    """OpenCV 当前启用的 SIMD 特性（关闭优化代码路径时为空）"""
+    return [name for name, feature in CPU_FEATURES if cv2.checkHardwareSupport(feature)]
+
+
+def hardware_report():
+    """OpenCV 版本、线程数、优化开关、可用的核和 SIMD 特性"""
+    features_line = cv2.getCPUFeaturesLine() if hasattr(cv2, 'getCPUFeaturesLine') else None
+    return {
+        'opencv': cv2.__version__,
+        'opencv_threads': cv2.getNumThreads(),
+        'opencv_optimized': cv2.useOptimized(),
+        'cpus': len(available_cpus()),
+        'simd': simd_features(),
+        # 编译时的基线特性与运行时分派的特性（带 * 的为分派）
+        'cpu_features_line': features_line,
+    }
+
+
+def format_hardware_report(report=None):
+    report = report or hardware_report()
+    simd = ' '.join(report['simd']) or '无'
+    text = (f"OpenCV {report['opencv']}：{report['cpus']} 个可用核，当前进程 {report['opencv_threads']} 线程，"
+            f"优化代码路径{'开启' if report['opencv_optimized'] else '关闭'}，SIMD: {simd}")
+    if report['cpu_features_line']:
+        text += f"（编译特性: {report['cpu_features_line']}）"
+    return text
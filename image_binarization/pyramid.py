@@ -0,0 +1,78 @@
+"""多分辨率图像金字塔：预览、裁剪窗口和缩略图都从最接近的层级缩放
+
+第 k 层的尺寸约为原图的 1/2^k，层级按需生成（每层只由上一层缩小一次），
+因此无论原图多大，每次重绘的缩放代价都只与目标尺寸相关。
+"""
+import cv2
+
+from .tiled import is_memmap, half_size_tiled
+
+
+class ImagePyramid:
+    """按需生成的 2 的幂次图像金字塔（第0层即原图本身，不复制）"""
+
+    def __init__(self, image):
+        self.base = image
+        self.levels = [image]
+
+    def level(self, index):
+        """返回第 index 层，未生成的层级会依次生成"""
+        while len(self.levels) <= index:
+            previous = self.levels[-1]
+            height, width = previous.shape[:2]
+            if width <= 1 and height <= 1:
+                return previous
+            if is_memmap(previous):
+                # 内存映射的大图逐行带缩小，不整体读入内存
+                self.levels.append(half_size_tiled(previous))
+                continue
+            size = (max(1, (width + 1) // 2), max(1, (height + 1) // 2))
+            self.levels.append(cv2.resize(previous, size, interpolation=cv2.INTER_AREA))
+        return self.levels[index]
+
+    def level_for_size(self, width, height):
+        """返回尺寸不小于目标尺寸的最小层级（从它缩放最多只需缩小一半）"""
+        index = 0
+        base_height, base_width = self.base.shape[:2]
+        # 第 k 层尺寸为原图尺寸除以 2^k 向上取整，这里用向下取整保守估计
+        while (base_width >> (index + 1)) >= max(width, 1) and (base_height >> (index + 1)) >= max(height, 1):
+            index += 1
+        return self.level(index)
+
+    def prebuild(self, max_side):
+        """预先生成各层级，直到最长边不超过 max_side（可在后台线程中调用）"""
+        index = 0
+        while max(self.level(index).shape[:2]) > max_side:
+            index += 1
+        return self
+
+    def resize_region(self, region, width, height):
+        """把原图上的区域 (x, y, 宽, 高) 缩放到指定尺寸，只读取最接近的层级中对应的部分
+
+        缩小时用 INTER_AREA，放大（像素级查看）时用 INTER_NEAREST 保持像素边界清晰。
+        """
+        x, y, region_width, region_height = region
+        base_height, base_width = self.base.shape[:2]
+        index = 0
+        while ((region_width >> (index + 1)) >= max(width, 1)
+               and (region_height >> (index + 1)) >= max(height, 1)):
+            index += 1
+        source = self.level(index)
+        level_height, level_width = source.shape[:2]
+        x0 = x * level_width // base_width
+        y0 = y * level_height // base_height
+        x1 = max(x0 + 1, -(-(x + region_width) * level_width // base_width))
+        y1 = max(y0 + 1, -(-(y + region_height) * level_height // base_height))
+        crop = source[y0:y1, x0:x1]
+        if crop.shape[1] == width and crop.shape[0] == height:
+            return crop
+        enlarge = width > crop.shape[1] or height > crop.shape[0]
+        return cv2.resize(crop, (width, height),
+                          interpolation=cv2.INTER_NEAREST if enlarge else cv2.INTER_AREA)
+
+    def resize(self, width, height, interpolation=cv2.INTER_AREA):
+        """从最接近的层级缩放到指定尺寸"""
+        source = self.level_for_size(width, height)
+        if source.shape[1] == width and source.shape[0] == height:
+            return source
+        return cv2.resize(source, (width, height), interpolation=interpolation)
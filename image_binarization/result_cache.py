@@ -0,0 +1,171 @@
+"""按内容寻址的二值化结果缓存（磁盘，按大小上限 LRU 淘汰）
+
+键由源文件内容哈希、裁剪区域、灰度转换方法和阈值参数组成，值为按位打包的二值化结果
+及其灰度直方图和黑白像素统计。命中时无需解码源图即可直接写出结果。
+每个条目是两个文件：<键>.npy（打包数据）和 <键>.json（元数据）；
+命中时更新文件的修改时间，淘汰时删除修改时间最早的条目。
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .bitpacked import PackedBinary
+from .thresholds import as_settings
+from .tiled import cache_dir
+
+# 灰度转换方法：OpenCV 的 BT.601 加权（RGB2GRAY 与 BGR2GRAY 结果相同），
+# 或解码时直接得到灰度（IMREAD_GRAYSCALE，JPEG 直接取亮度分量，与前者有细微差异）
+GRAY_METHOD = 'opencv_bt601'
+GRAY_DECODE_METHOD = 'imread_grayscale'
+
+# 缓存大小上限（可用环境变量 IMAGE_BINARIZATION_RESULT_CACHE_MB 覆盖）
+DEFAULT_MAX_BYTES = 1024 ** 3
+CACHE_SIZE_ENV = 'IMAGE_BINARIZATION_RESULT_CACHE_MB'
+
+# 文件哈希的进程内缓存：(绝对路径, 大小, 修改时间) -> 哈希
+_digest_memo = {}
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """文件内容的 SHA-1（分块读取）"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_digest(file_path):
+    """源文件内容哈希，文件未变（大小与修改时间相同）时直接返回上次的结果"""
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    digest = _digest_memo.get(memo_key)
+    if digest is None:
+        digest = _digest_memo[memo_key] = file_digest(file_path)
+    return digest
+
+
+def result_key(digest, roi, settings, gray_method=GRAY_METHOD):
+    """缓存键：roi 为 (x, y, 宽, 高)，None 表示整幅图像"""
+    description = {
+        'source': digest,
+        'roi': list(roi) if roi is not None else None,
+        'gray': gray_method,
+        'settings': list(as_settings(settings).key()),
+    }
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class CachedResult:
+    """缓存命中的结果：打包的二值图、灰度直方图（可能为 None）和统计"""
+
+    def __init__(self, packed, histogram, stats):
+        self.packed = packed
+        self.histogram = histogram
+        self.stats = stats
+
+
+class ResultCache:
+    """磁盘上的结果缓存（多个进程可以同时使用同一目录）"""
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.path.join(cache_dir(), 'results')
+        if max_bytes is None:
+            size_mb = os.environ.get(CACHE_SIZE_ENV)
+            max_bytes = int(float(size_mb) * 1024 ** 2) if size_mb else DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.evict()  # 上限调小后立即生效
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + '.npy', base + '.json'
+
+    def contains(self, key):
+        """条目是否存在（不更新最近使用时间）"""
+        return all(os.path.exists(path) for path in self._paths(key))
+
+    def get(self, key):
+        """查找缓存，未命中（或条目不完整）时返回 None"""
+        bits_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            bits = np.load(bits_path)
+        except (OSError, ValueError):
+            return None
+
+        # 记录最近使用时间（LRU）
+        for path in (bits_path, meta_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        histogram = np.array(meta['histogram'], dtype=np.int64) if meta.get('histogram') else None
+        return CachedResult(PackedBinary(bits, meta['shape']), histogram, meta['stats'])
+
+    def put(self, key, packed, histogram=None):
+        """写入缓存（先写临时文件再改名，并发写入同一键也不会留下不完整的条目）"""
+        total = packed.height * packed.width
+        white = packed.count_white()
+        meta = {
+            'shape': list(packed.shape),
+            'histogram': [int(v) for v in histogram] if histogram is not None else None,
+            'stats': {'black': total - white, 'white': white, 'total': total},
+        }
+        bits_path, meta_path = self._paths(key)
+
+        fd, partial = tempfile.mkstemp(suffix='.partial', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.ascontiguousarray(packed.bits))
+        os.replace(partial, bits_path)
+
+        fd, partial = tempfile.mkstemp(suffix='.partial', dir=self.directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(partial, meta_path)
+
+        self.evict()
+
+    def _entries(self):
+        """返回 [(最近使用时间, 大小, 键)]"""
+        entries = {}
+        for entry in os.scandir(self.directory):
+            key, extension = os.path.splitext(entry.name)
+            if extension not in ('.npy', '.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            used, size = entries.get(key, (0, 0))
+            entries[key] = (max(used, stat.st_mtime), size + stat.st_size)
+        return [(used, size, key) for key, (used, size) in entries.items()]
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """超过大小上限时按最近使用时间从旧到新删除条目"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # 其他进程已删除，或（Windows 上）仍在使用
+            total -= size
+
+    def clear(self):
+        for _, _, key in self._entries():
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
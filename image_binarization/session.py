@@ -0,0 +1,256 @@
+"""多图会话：一次打开多张图片，后台预取相邻页面并生成缩略图
+
+解码后的图片（原图缓冲区、预览金字塔、内容哈希）保存在按总字节数限制的 LRU 中，
+翻页时命中即可立即显示；当前页之后的若干张由后台线程提前解码。
+缩略图单独缓存（很小），由另一个后台线程按缩略图条带的可见范围生成。
+本模块不依赖 tkinter，界面通过定时调用 completed_thumbnails() 取回生成好的缩略图。
+"""
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from .binarization_core import fit_to_canvas, load_display_color, open_image, read_preview
+from .pyramid import ImagePyramid
+from .result_cache import source_digest
+from .tiled import is_memmap
+
+# 已解码图片 LRU 的默认大小上限（字节）
+DEFAULT_SESSION_BYTES = 1024 ** 3
+
+# 默认预取当前页之后的张数
+DEFAULT_PREFETCH = 2
+
+# 缩略图最长边与缓存的缩略图数量
+THUMBNAIL_SIDE = 96
+MAX_THUMBNAILS = 1024
+
+
+class DecodedImage:
+    """一张已解码的图片：原图、预览金字塔与内容哈希（未启用结果缓存时为 None）"""
+
+    def __init__(self, path, image, pyramid, digest, grayscale):
+        self.path = path
+        self.image = image
+        self.pyramid = pyramid
+        self.digest = digest
+        self.grayscale = grayscale
+
+    @property
+    def nbytes(self):
+        """占用的内存（内存映射的原图由操作系统按需换入换出，不计入）"""
+        levels = self.pyramid.levels if self.pyramid is not None else [self.image]
+        return sum(level.nbytes for level in levels if not is_memmap(level))
+
+
+def decode_image(path, grayscale=False, pyramid_side=256, with_digest=False, check=None):
+    """解码图片并预先生成预览金字塔（在后台线程中调用）"""
+    image = open_image(path, grayscale)
+    if check is not None:
+        check()
+    pyramid = ImagePyramid(image).prebuild(pyramid_side)
+    if check is not None:
+        check()
+    digest = source_digest(path) if with_digest else None
+    return DecodedImage(path, image, pyramid, digest, grayscale)
+
+
+def make_thumbnail(path, side=THUMBNAIL_SIDE, decoded=None):
+    """生成最长边为 side 的缩略图（RGB 或灰度）
+
+    已解码时从预览金字塔缩放；否则 JPEG 缩小解码，其他格式完整解码后缩小（不保留原图）。
+    """
+    if decoded is not None:
+        width, height = fit_to_canvas(decoded.image.shape, side, side)
+        return decoded.pyramid.resize(max(1, width), max(1, height))
+    preview = read_preview(path, side)
+    image = preview[0] if preview is not None else load_display_color(path, side)
+    width, height = fit_to_canvas(image.shape, side, side)
+    return cv2.resize(image, (max(1, width), max(1, height)), interpolation=cv2.INTER_AREA)
+
+
+class ImageSession:
+    """多图会话：当前页、已解码图片 LRU、后台预取和缩略图"""
+
+    def __init__(self, paths, grayscale=False, max_bytes=DEFAULT_SESSION_BYTES,
+                 prefetch=DEFAULT_PREFETCH, pyramid_side=256, with_digest=False,
+                 thumbnail_side=THUMBNAIL_SIDE):
+        self.paths = list(paths)
+        self.grayscale = grayscale
+        self.max_bytes = max_bytes
+        self.prefetch_count = prefetch
+        self.pyramid_side = pyramid_side
+        self.with_digest = with_digest
+        self.thumbnail_side = thumbnail_side
+        self.index = 0
+
+        self._lock = threading.Lock()
+        self._decoded = OrderedDict()  # 路径 -> DecodedImage（最近使用的在末尾）
+        self._in_flight = {}  # 路径 -> 正在预取的 Future
+        self._wanted = set()  # 当前预取窗口内的路径，窗口移走后尚未开始的预取直接跳过
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+
+        self._thumbnails = OrderedDict()  # 索引 -> 缩略图
+        self._thumbnail_requested = set()
+        self._thumbnail_visible = set()
+        self._thumbnail_results = queue.SimpleQueue()
+        self._thumbnail_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnail')
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def current_path(self):
+        return self.paths[self.index]
+
+    def _decode(self, path, check=None):
+        return decode_image(path, self.grayscale, self.pyramid_side, self.with_digest, check)
+
+    # ---- 已解码图片 LRU ----
+
+    def cached(self, index):
+        """已解码（或已预取）的图片，没有时返回 None"""
+        path = self.paths[index]
+        with self._lock:
+            decoded = self._decoded.get(path)
+            if decoded is not None:
+                self._decoded.move_to_end(path)
+        return decoded
+
+    def _store(self, decoded):
+        with self._lock:
+            self._decoded[decoded.path] = decoded
+            self._decoded.move_to_end(decoded.path)
+        self.evict()
+
+    def evict(self):
+        """超出大小上限时淘汰最久未使用的图片（当前页不淘汰）"""
+        with self._lock:
+            total = sum(entry.nbytes for entry in self._decoded.values())
+            for path in list(self._decoded):
+                if total <= self.max_bytes:
+                    break
+                if path == self.current_path:
+                    continue
+                total -= self._decoded.pop(path).nbytes
+
+    def memory_bytes(self):
+        with self._lock:
+            return sum(entry.nbytes for entry in self._decoded.values())
+
+    def load(self, index, check=None):
+        """返回第 index 张的解码结果（可在后台线程中调用）
+
+        已缓存时直接返回；正在预取时等待预取完成，不重复解码。
+        """
+        path = self.paths[index]
+        decoded = self.cached(index)
+        if decoded is not None:
+            self.hits += 1
+            return decoded
+        self.misses += 1
+        with self._lock:
+            future = self._in_flight.get(path)
+        if future is not None:
+            decoded = future.result()
+            if decoded is not None:
+                return decoded
+        decoded = self._decode(path, check)
+        self._store(decoded)
+        return decoded
+
+    # ---- 预取 ----
+
+    def go_to(self, index):
+        """切换当前页并预取其后的若干张（以及前一张，便于往回翻）"""
+        self.index = max(0, min(index, len(self.paths) - 1))
+        self.evict()
+        self.prefetch_around(self.index)
+        return self.index
+
+    def prefetch_around(self, index):
+        order = [index + offset for offset in range(1, self.prefetch_count + 1)] + [index - 1]
+        wanted = [self.paths[i] for i in order if 0 <= i < len(self.paths)]
+        with self._lock:
+            self._wanted = set(wanted) | {self.paths[index]}
+            todo = [path for path in wanted
+                    if path not in self._decoded and path not in self._in_flight]
+            for path in todo:
+                self._in_flight[path] = self._prefetch_pool.submit(self._prefetch, path)
+
+    def _prefetch(self, path):
+        try:
+            with self._lock:
+                if path not in self._wanted:
+                    return None  # 已翻到别处，不再需要
+            decoded = self._decode(path)
+            self._store(decoded)
+            return decoded
+        except Exception as e:
+            # 预取失败不影响界面，真正翻到这一页时会重新读取并报告错误
+            print(f"预取图片时发生错误: {path}: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._in_flight.pop(path, None)
+
+    # ---- 缩略图 ----
+
+    def thumbnail(self, index):
+        """已生成的缩略图，没有时返回 None"""
+        with self._lock:
+            return self._thumbnails.get(index)
+
+    def request_thumbnails(self, indices):
+        """请求生成可见范围内的缩略图；已移出可见范围且尚未开始的请求会被跳过"""
+        indices = [i for i in indices if 0 <= i < len(self.paths)]
+        with self._lock:
+            self._thumbnail_visible = set(indices)
+            todo = [i for i in indices
+                    if i not in self._thumbnails and i not in self._thumbnail_requested]
+            self._thumbnail_requested.update(todo)
+        for i in todo:
+            self._thumbnail_pool.submit(self._make_thumbnail, i)
+
+    def _make_thumbnail(self, index):
+        try:
+            with self._lock:
+                if index not in self._thumbnail_visible:
+                    return
+            path = self.paths[index]
+            with self._lock:
+                decoded = self._decoded.get(path)
+            thumbnail = make_thumbnail(path, self.thumbnail_side, decoded)
+        except Exception as e:
+            print(f"生成缩略图时发生错误: {self.paths[index]}: {str(e)}")
+            return
+        finally:
+            with self._lock:
+                self._thumbnail_requested.discard(index)
+        with self._lock:
+            self._thumbnails[index] = thumbnail
+            while len(self._thumbnails) > MAX_THUMBNAILS:
+                self._thumbnails.popitem(last=False)
+        self._thumbnail_results.put(index)
+
+    def completed_thumbnails(self):
+        """在界面线程中调用：返回自上次调用以来生成完成的缩略图索引"""
+        indices = []
+        while True:
+            try:
+                indices.append(self._thumbnail_results.get_nowait())
+            except queue.Empty:
+                return indices
+
+    def close(self):
+        """停止后台预取和缩略图生成"""
+        with self._lock:
+            self._wanted = set()
+            self._thumbnail_visible = set()
+        self._prefetch_pool.shutdown(wait=False, cancel_futures=True)
+        self._thumbnail_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,139 @@
+"""后台任务执行器：在工作线程中运行耗时处理，结果交回界面线程
+
+同一通道（channel）的任务“后来者优先”：提交新任务时，旧任务若尚未开始则直接取消，
+若正在运行则通过取消令牌通知其尽早退出，其结果也会被丢弃。
+本模块不依赖 tkinter，界面通过定时调用 process_results() 在主线程执行回调。
+"""
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+
+class JobCancelled(Exception):
+    """任务已被更新的任务取代"""
+
+
+class CancelToken:
+    """协作式取消令牌，耗时任务应在各阶段之间调用 check()"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """已取消时抛出 JobCancelled"""
+        if self._event.is_set():
+            raise JobCancelled()
+
+
+class _Job:
+    def __init__(self, job_id, channel, label, token, on_done, on_error):
+        self.job_id = job_id
+        self.channel = channel
+        self.label = label
+        self.token = token
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future = None
+        self.started_at = None
+
+
+class LatestWinsExecutor:
+    """按通道管理的后台执行器（后来者优先）"""
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='binarization')
+        self._ids = itertools.count(1)
+        self._latest = {}  # channel -> 最新任务
+        self._results = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self.dropped_jobs = 0  # 被取消或丢弃结果的任务数
+
+    def submit(self, channel, func, *args, label=None, on_done=None, on_error=None):
+        """提交任务，func 的第一个参数为 CancelToken，返回该令牌"""
+        token = CancelToken()
+        job = _Job(next(self._ids), channel, label, token, on_done, on_error)
+
+        with self._lock:
+            previous = self._latest.get(channel)
+            self._latest[channel] = job
+        if previous is not None:
+            self._discard(previous)
+
+        job.future = self._pool.submit(self._run, job, func, args)
+        return token
+
+    def cancel(self, channel):
+        """取消某通道上的任务"""
+        with self._lock:
+            job = self._latest.pop(channel, None)
+        if job is not None:
+            self._discard(job)
+
+    def cancel_all(self):
+        """取消所有通道上的任务"""
+        with self._lock:
+            jobs = list(self._latest.values())
+            self._latest.clear()
+        for job in jobs:
+            self._discard(job)
+
+    def _discard(self, job):
+        job.token.cancel()
+        if job.future is not None:
+            job.future.cancel()
+        self.dropped_jobs += 1
+
+    def _run(self, job, func, args):
+        job.started_at = time.perf_counter()
+        try:
+            job.token.check()
+            result = func(job.token, *args)
+        except (JobCancelled, CancelledError):
+            return
+        except Exception as e:
+            self._results.put((job, False, e))
+        else:
+            self._results.put((job, True, result))
+
+    def active_jobs(self):
+        """返回正在运行的任务 [(标签, 已运行秒数)]"""
+        now = time.perf_counter()
+        with self._lock:
+            jobs = list(self._latest.values())
+        return [(job.label, now - job.started_at) for job in jobs
+                if job.started_at is not None and job.future is not None
+                and not job.future.done()]
+
+    def process_results(self):
+        """在界面线程中调用：执行已完成任务的回调，过期任务的结果直接丢弃"""
+        while True:
+            try:
+                job, ok, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+
+            with self._lock:
+                is_latest = self._latest.get(job.channel) is job
+                if is_latest:
+                    del self._latest[job.channel]
+            if not is_latest or job.token.cancelled:
+                continue
+
+            callback = job.on_done if ok else job.on_error
+            if callback is not None:
+                callback(value)
+
+    def shutdown(self):
+        """取消所有任务并关闭线程池"""
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
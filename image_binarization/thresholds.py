@@ -0,0 +1,227 @@
+"""阈值模式：全局手动、Otsu、三角法、自适应均值/高斯、Sauvola、Niblack
+
+Otsu 与三角法直接由缓存的256项直方图求出阈值（O(256)）；
+Sauvola/Niblack 基于积分图计算局部均值和标准差，每个像素的窗口代价为 O(1)，
+并按行带处理以限制积分图占用的内存。
+"""
+import cv2
+import numpy as np
+
+from .tiled import allocate_like
+
+# 模式名称 -> 界面显示名称
+THRESHOLD_MODES = {
+    'global': '全局阈值（手动）',
+    'otsu': 'Otsu 自动阈值',
+    'triangle': '三角法自动阈值',
+    'adaptive_mean': '自适应（均值）',
+    'adaptive_gaussian': '自适应（高斯）',
+    'sauvola': 'Sauvola 局部阈值',
+    'niblack': 'Niblack 局部阈值',
+}
+
+# 由直方图决定一个全局阈值的模式（可用查找表预览、用直方图统计）
+GLOBAL_MODES = ('global', 'otsu', 'triangle')
+
+# 局部窗口模式
+LOCAL_MODES = ('adaptive_mean', 'adaptive_gaussian', 'sauvola', 'niblack')
+
+# 各局部模式的默认 k 值
+DEFAULT_K = {'sauvola': 0.2, 'niblack': -0.2}
+
+# Sauvola 公式中标准差的动态范围
+SAUVOLA_R = 128.0
+
+
+class ThresholdSettings:
+    """二值化参数：模式、手动阈值、局部窗口大小、k 值和自适应偏移量"""
+
+    def __init__(self, mode='global', threshold=127, window=31, k=None, offset=2):
+        if mode not in THRESHOLD_MODES:
+            raise ValueError(f"未知的阈值模式: {mode}")
+        self.mode = mode
+        self.threshold = int(threshold)
+        self.window = odd_window(window)
+        self.k = DEFAULT_K.get(mode, 0.0) if k is None else float(k)
+        self.offset = float(offset)
+
+    @property
+    def is_global(self):
+        return self.mode in GLOBAL_MODES
+
+    def key(self):
+        """用于缓存比较的参数元组（只包含对该模式有意义的参数）"""
+        if self.mode == 'global':
+            return (self.mode, self.threshold)
+        if self.mode in ('otsu', 'triangle'):
+            return (self.mode,)
+        if self.mode in ('adaptive_mean', 'adaptive_gaussian'):
+            return (self.mode, self.window, self.offset)
+        return (self.mode, self.window, self.k)
+
+    def to_dict(self):
+        return {'mode': self.mode, 'threshold': self.threshold, 'window': self.window,
+                'k': self.k, 'offset': self.offset}
+
+    def scaled(self, scale):
+        """按预览缩放比例缩小窗口后的参数（用于在缩小的预览图上模拟局部阈值）"""
+        return ThresholdSettings(self.mode, self.threshold, max(3, round(self.window * scale)),
+                                 self.k, self.offset)
+
+    def __eq__(self, other):
+        return isinstance(other, ThresholdSettings) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"ThresholdSettings({self.to_dict()!r})"
+
+
+def odd_window(window):
+    """局部窗口大小取不小于3的奇数"""
+    window = max(3, int(window))
+    return window if window % 2 == 1 else window + 1
+
+
+def otsu_threshold(histogram):
+    """由直方图计算 Otsu 阈值（与 cv2.THRESH_OTSU 一致：大于阈值为白）"""
+    histogram = np.asarray(histogram, dtype=np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 0
+    levels = np.arange(256, dtype=np.float64)
+    weight0 = np.cumsum(histogram)
+    weight1 = total - weight0
+    sum0 = np.cumsum(histogram * levels)
+    mean0 = np.divide(sum0, weight0, out=np.zeros(256), where=weight0 > 0)
+    mean1 = np.divide(sum0[-1] - sum0, weight1, out=np.zeros(256), where=weight1 > 0)
+    between = weight0 * weight1 * (mean0 - mean1) ** 2
+    return int(np.argmax(between))
+
+
+def triangle_threshold(histogram):
+    """由直方图计算三角法阈值（移植自 OpenCV 的 THRESH_TRIANGLE 实现）"""
+    histogram = np.asarray(histogram, dtype=np.int64).copy()
+    size = 256
+    nonzero = np.flatnonzero(histogram)
+    if nonzero.size == 0:
+        return 0
+
+    left_bound = int(nonzero[0])
+    if left_bound > 0:
+        left_bound -= 1
+    right_bound = int(nonzero[-1]) if nonzero[-1] > 0 else 0
+    if right_bound < size - 1:
+        right_bound += 1
+    max_index = int(np.argmax(histogram))
+    max_value = int(histogram[max_index])
+
+    flipped = False
+    if max_index - left_bound < right_bound - max_index:
+        flipped = True
+        histogram = histogram[::-1]
+        left_bound = size - 1 - right_bound
+        max_index = size - 1 - max_index
+
+    threshold = left_bound
+    a = max_value
+    b = left_bound - max_index
+    best = 0
+    for i in range(left_bound + 1, max_index + 1):
+        distance = a * i + b * int(histogram[i])
+        if distance > best:
+            best = distance
+            threshold = i
+    threshold -= 1
+
+    if flipped:
+        threshold = size - 1 - threshold
+    return threshold
+
+
+def global_threshold(settings, histogram):
+    """全局模式下实际使用的阈值"""
+    if settings.mode == 'otsu':
+        return otsu_threshold(histogram)
+    if settings.mode == 'triangle':
+        return triangle_threshold(histogram)
+    return settings.threshold
+
+
+def as_settings(value):
+    """整数阈值视为全局手动阈值，其余原样返回"""
+    if isinstance(value, ThresholdSettings):
+        return value
+    return ThresholdSettings('global', threshold=value)
+
+
+def local_binarize(gray_image, settings, band_rows=1024, check=None):
+    """局部阈值二值化（自适应均值/高斯、Sauvola、Niblack）"""
+    if settings.mode in ('adaptive_mean', 'adaptive_gaussian'):
+        return adaptive_binarize(gray_image, settings, band_rows, check)
+    if settings.mode in ('sauvola', 'niblack'):
+        return integral_binarize(gray_image, settings, band_rows, check)
+    raise ValueError(f"不是局部阈值模式: {settings.mode}")
+
+
+def adaptive_binarize(gray_image, settings, band_rows=1024, check=None):
+    """按行带调用 cv2.adaptiveThreshold（每个行带上下各多取半个窗口，结果与整图计算一致）"""
+    method = (cv2.ADAPTIVE_THRESH_MEAN_C if settings.mode == 'adaptive_mean'
+              else cv2.ADAPTIVE_THRESH_GAUSSIAN_C)
+    height = gray_image.shape[0]
+    half = settings.window // 2
+    binary_image = allocate_like(gray_image)
+    for start in range(0, height, band_rows):
+        if check is not None:
+            check()
+        end = min(start + band_rows, height)
+        top = max(0, start - half)
+        bottom = min(height, end + half)
+        band = cv2.adaptiveThreshold(gray_image[top:bottom], 255, method, cv2.THRESH_BINARY,
+                                     settings.window, settings.offset)
+        binary_image[start:end] = band[start - top:end - top]
+    return binary_image
+
+
+def integral_binarize(gray_image, settings, band_rows=1024, check=None):
+    """基于积分图的 Sauvola/Niblack 二值化
+
+    每个行带只对（行带 + 上下半个窗口）计算积分图，窗口在图像边界处截断。
+    """
+    height, width = gray_image.shape[:2]
+    half = settings.window // 2
+    binary_image = allocate_like(gray_image)
+
+    # 每一列窗口的左右边界（在整幅图像坐标下，列方向不分块）
+    cols = np.arange(width)
+    x0 = np.clip(cols - half, 0, width)
+    x1 = np.clip(cols + half + 1, 0, width)
+
+    for start in range(0, height, band_rows):
+        if check is not None:
+            check()
+        end = min(start + band_rows, height)
+        top = max(0, start - half)
+        bottom = min(height, end + half)
+        integral, integral_sq = cv2.integral2(gray_image[top:bottom], sdepth=cv2.CV_64F,
+                                              sqdepth=cv2.CV_64F)
+
+        rows = np.arange(start, end)
+        y0 = (np.clip(rows - half, 0, height) - top)[:, None]
+        y1 = (np.clip(rows + half + 1, 0, height) - top)[:, None]
+        count = (y1 - y0) * (x1 - x0)[None, :]
+
+        window_sum = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+        window_sq = (integral_sq[y1, x1] - integral_sq[y0, x1]
+                     - integral_sq[y1, x0] + integral_sq[y0, x0])
+        mean = window_sum / count
+        std = np.sqrt(np.maximum(window_sq / count - mean * mean, 0.0))
+
+        if settings.mode == 'sauvola':
+            local = mean * (1.0 + settings.k * (std / SAUVOLA_R - 1.0))
+        else:
+            local = mean + settings.k * std
+
+        binary_image[start:end] = np.where(gray_image[start:end] > local, 255, 0)
+    return binary_image
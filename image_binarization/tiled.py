@@ -0,0 +1,183 @@
+"""大图（千兆像素级）分块处理：内存映射的图像数据与逐行带的灰度/统计/阈值计算
+
+解码结果以 .npy 文件缓存并通过内存映射访问，灰度转换、直方图、二值化和金字塔缩小
+都按行带（默认512行）流式处理，输出同样写入内存映射文件，
+因此峰值内存与行带大小成正比，而与图像大小无关。
+首次打开时仍需完整解码一次（OpenCV 不支持分块解码），之后再次打开同一文件直接映射缓存。
+"""
+import hashlib
+import os
+import tempfile
+import weakref
+
+import cv2
+import numpy as np
+
+# 每个行带的行数
+DEFAULT_TILE_ROWS = 512
+
+# 超过该像素数的图片自动使用分块模式
+LARGE_IMAGE_PIXELS = 50_000_000
+
+# 小于该字节数的中间结果即使输入是内存映射也直接放在内存中
+MEMMAP_MIN_BYTES = 16 * 1024 * 1024
+
+
+def cache_dir():
+    """内存映射缓存目录（可通过环境变量 IMAGE_BINARIZATION_CACHE 指定）"""
+    path = os.environ.get('IMAGE_BINARIZATION_CACHE') or os.path.join(
+        tempfile.gettempdir(), 'image_binarization')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def is_memmap(image):
+    """图像是否由内存映射文件支持（包括其切片视图）"""
+    while image is not None:
+        if isinstance(image, np.memmap):
+            return True
+        image = getattr(image, 'base', None)
+    return False
+
+
+def image_size(file_path):
+    """只读取文件头获取 (宽, 高)，无法识别时返回 None"""
+    try:
+        from PIL import Image
+        Image.MAX_IMAGE_PIXELS = None
+        with Image.open(file_path) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def image_pixels(file_path):
+    """只读取文件头获取像素数，无法识别时返回 None"""
+    size = image_size(file_path)
+    return None if size is None else size[0] * size[1]
+
+
+def should_use_tiled(file_path, limit=None):
+    """是否应以分块模式打开该文件（默认阈值为 LARGE_IMAGE_PIXELS）"""
+    if file_path.lower().endswith('.npy'):
+        return True
+    pixels = image_pixels(file_path)
+    limit = LARGE_IMAGE_PIXELS if limit is None else limit
+    return pixels is not None and pixels > limit
+
+
+def iter_row_bands(height, tile_rows=DEFAULT_TILE_ROWS):
+    """按行带遍历，返回 (起始行, 结束行)"""
+    for row in range(0, height, tile_rows):
+        yield row, min(row + tile_rows, height)
+
+
+def allocate(shape, dtype=np.uint8, directory=None):
+    """在缓存目录中创建临时内存映射数组，数组释放后文件自动删除"""
+    fd, path = tempfile.mkstemp(suffix='.npy', dir=directory or cache_dir())
+    os.close(fd)
+    array = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    weakref.finalize(array, _remove_quietly, path)
+    return array
+
+
+def allocate_like(image, shape=None, dtype=np.uint8):
+    """输入为内存映射时（且输出足够大）输出也使用内存映射，否则使用普通数组"""
+    shape = image.shape if shape is None else shape
+    if is_memmap(image) and int(np.prod(shape)) * np.dtype(dtype).itemsize >= MEMMAP_MIN_BYTES:
+        return allocate(shape, dtype)
+    return np.empty(shape, dtype)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def open_tiled_image(file_path, tile_rows=DEFAULT_TILE_ROWS, grayscale=False):
+    """以内存映射方式打开图片（RGB 或灰度），返回只读数组
+
+    .npy 文件直接映射；其他格式首次打开时解码并按行带写入 .npy 缓存，
+    缓存以文件路径、大小和修改时间为键，源文件不变时再次打开无需解码。
+    grayscale=True 时直接解码为单通道灰度图（缓存与彩色分开）。
+    """
+    if file_path.lower().endswith('.npy'):
+        return np.load(file_path, mmap_mode='r')
+
+    stat = os.stat(file_path)
+    key = f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    if grayscale:
+        key += '|gray'
+    cache_path = os.path.join(cache_dir(), hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npy')
+    if os.path.exists(cache_path):
+        return np.load(cache_path, mmap_mode='r')
+
+    # 灰度扫描件保持单通道，避免缓存成三通道
+    decoded = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_ANYCOLOR)
+    if decoded is None:
+        raise ValueError("无法读取图片文件！")
+
+    # 先写入临时文件再改名，避免中途失败留下不完整的缓存
+    partial_path = cache_path + '.partial'
+    cached = np.lib.format.open_memmap(partial_path, mode='w+', dtype=np.uint8, shape=decoded.shape)
+    for start, end in iter_row_bands(decoded.shape[0], tile_rows):
+        if decoded.ndim == 3:
+            cv2.cvtColor(decoded[start:end], cv2.COLOR_BGR2RGB, dst=cached[start:end])
+        else:
+            cached[start:end] = decoded[start:end]
+    cached.flush()
+    del cached, decoded
+    os.replace(partial_path, cache_path)
+    return np.load(cache_path, mmap_mode='r')
+
+
+def gray_and_histogram_tiled(image, code=cv2.COLOR_RGB2GRAY, tile_rows=DEFAULT_TILE_ROWS, check=None):
+    """逐行带转换灰度并同时累计直方图（只读一遍原图；已是灰度图时不复制）"""
+    if image.ndim == 2:
+        return image, histogram_tiled(image, tile_rows)
+    height, width = image.shape[:2]
+    gray_image = allocate_like(image, (height, width))
+    histogram = np.zeros(256, dtype=np.int64)
+    for start, end in iter_row_bands(height, tile_rows):
+        if check is not None:
+            check()
+        band = gray_image[start:end]
+        cv2.cvtColor(image[start:end], code, dst=band)
+        histogram += np.bincount(band.ravel(), minlength=256)
+    return gray_image, histogram
+
+
+def histogram_tiled(gray_image, tile_rows=DEFAULT_TILE_ROWS):
+    """逐行带累计灰度直方图"""
+    histogram = np.zeros(256, dtype=np.int64)
+    for start, end in iter_row_bands(gray_image.shape[0], tile_rows):
+        histogram += np.bincount(gray_image[start:end].ravel(), minlength=256)
+    return histogram
+
+
+def binarize_tiled(gray_image, threshold, tile_rows=DEFAULT_TILE_ROWS, check=None):
+    """逐行带全局阈值二值化"""
+    binary_image = allocate_like(gray_image)
+    for start, end in iter_row_bands(gray_image.shape[0], tile_rows):
+        if check is not None:
+            check()
+        cv2.threshold(gray_image[start:end], threshold, 255, cv2.THRESH_BINARY,
+                      dst=binary_image[start:end])
+    return binary_image
+
+
+def half_size_tiled(image, tile_rows=DEFAULT_TILE_ROWS):
+    """逐行带缩小为一半（行带取偶数行，偶数尺寸时与整体 INTER_AREA 缩放结果完全一致）"""
+    tile_rows += tile_rows % 2
+    height, width = image.shape[:2]
+    out_width = max(1, (width + 1) // 2)
+    out_height = max(1, (height + 1) // 2)
+    output = allocate_like(image, (out_height, out_width) + image.shape[2:])
+    for start, end in iter_row_bands(height, tile_rows):
+        out_start = start // 2
+        out_end = min(out_height, out_start + (end - start + 1) // 2)
+        output[out_start:out_end] = cv2.resize(image[start:end], (out_width, out_end - out_start),
+                                               interpolation=cv2.INTER_AREA)
+    return output
@@ -0,0 +1,110 @@
+"""平移/缩放视口：三个面板共享同一视口，只缩放和绘制可见区域
+
+视口用缩放倍数（1 = 适应画布）和视口中心（相对于图像宽高的 0~1 坐标）描述，
+与图像分辨率无关，因此原图、灰度图、二值图以及灰度导入时的彩色缩小图都能用同一视口对齐。
+每次重绘只从金字塔中最接近的层级截取可见区域再缩放，代价与画布尺寸成正比，与原图大小无关。
+"""
+import math
+
+from .binarization_core import fit_to_canvas
+
+# 画布四周留白（与 fit_to_canvas 一致）
+CANVAS_MARGIN = 20
+
+# 放大时每个图像像素最多显示为多少个屏幕像素
+MAX_PIXEL_SCALE = 16
+
+
+class Viewport:
+    """三个面板共享的视口"""
+
+    def __init__(self):
+        self.zoom = 1.0
+        self.center_x = 0.5
+        self.center_y = 0.5
+
+    def key(self):
+        return (self.zoom, self.center_x, self.center_y)
+
+    @property
+    def is_fit(self):
+        return self.zoom == 1.0
+
+    def reset(self):
+        """恢复为整幅图像适应画布"""
+        self.zoom = 1.0
+        self.center_x = 0.5
+        self.center_y = 0.5
+
+    def _fit_scale(self, shape, canvas_width, canvas_height):
+        img_height, img_width = shape[:2]
+        return min((canvas_width - CANVAS_MARGIN) / img_width,
+                   (canvas_height - CANVAS_MARGIN) / img_height, 1.0)
+
+    def scale(self, shape, canvas_width, canvas_height):
+        """显示比例（屏幕像素 / 图像像素）"""
+        return self._fit_scale(shape, canvas_width, canvas_height) * self.zoom
+
+    def region(self, shape, canvas_width, canvas_height):
+        """返回可见区域 (x, y, 宽, 高)（图像像素坐标）及其显示尺寸 (宽, 高)"""
+        img_height, img_width = shape[:2]
+        if self.is_fit:
+            return (0, 0, img_width, img_height), fit_to_canvas(shape, canvas_width, canvas_height)
+
+        scale = self.scale(shape, canvas_width, canvas_height)
+        visible_width = min(img_width, (canvas_width - CANVAS_MARGIN) / scale)
+        visible_height = min(img_height, (canvas_height - CANVAS_MARGIN) / scale)
+        left = min(max(self.center_x * img_width - visible_width / 2, 0), img_width - visible_width)
+        top = min(max(self.center_y * img_height - visible_height / 2, 0), img_height - visible_height)
+
+        x0, y0 = int(math.floor(left)), int(math.floor(top))
+        x1 = min(img_width, int(math.ceil(left + visible_width)))
+        y1 = min(img_height, int(math.ceil(top + visible_height)))
+        display_size = (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale)))
+        return (x0, y0, x1 - x0, y1 - y0), display_size
+
+    def _clamp_center(self, shape, canvas_width, canvas_height):
+        """视口中心限制在图像内（可见区域不超出图像边界）"""
+        img_height, img_width = shape[:2]
+        scale = self.scale(shape, canvas_width, canvas_height)
+        half_width = min(0.5, (canvas_width - CANVAS_MARGIN) / scale / img_width / 2)
+        half_height = min(0.5, (canvas_height - CANVAS_MARGIN) / scale / img_height / 2)
+        self.center_x = min(max(self.center_x, half_width), 1 - half_width)
+        self.center_y = min(max(self.center_y, half_height), 1 - half_height)
+
+    def zoom_at(self, factor, shape, canvas_width, canvas_height, canvas_x, canvas_y):
+        """以画布上的某点为中心缩放（该点下的图像内容保持不动），返回视口是否改变"""
+        fit = self._fit_scale(shape, canvas_width, canvas_height)
+        zoom = min(max(self.zoom * factor, 1.0), max(1.0, MAX_PIXEL_SCALE / fit))
+        if zoom == self.zoom:
+            return False
+
+        # 鼠标所指的图像位置（相对坐标）
+        (x, y, width, height), (display_width, display_height) = self.region(shape, canvas_width, canvas_height)
+        offset_x = (canvas_width - display_width) / 2
+        offset_y = (canvas_height - display_height) / 2
+        img_height, img_width = shape[:2]
+        point_x = (x + (canvas_x - offset_x) / display_width * width) / img_width
+        point_y = (y + (canvas_y - offset_y) / display_height * height) / img_height
+
+        old_scale = self.scale(shape, canvas_width, canvas_height)
+        self.zoom = zoom
+        ratio = old_scale / self.scale(shape, canvas_width, canvas_height)
+        self.center_x = point_x + (self.center_x - point_x) * ratio
+        self.center_y = point_y + (self.center_y - point_y) * ratio
+        if self.zoom == 1.0:
+            self.center_x = self.center_y = 0.5
+        self._clamp_center(shape, canvas_width, canvas_height)
+        return True
+
+    def pan(self, dx, dy, shape, canvas_width, canvas_height):
+        """按画布上的拖动距离（屏幕像素）平移，返回视口是否改变"""
+        if self.is_fit:
+            return False
+        img_height, img_width = shape[:2]
+        scale = self.scale(shape, canvas_width, canvas_height)
+        before = (self.center_x, self.center_y)
+        self.center_x -= dx / scale / img_width
+        self.center_y -= dy / scale / img_height
+        self._clamp_center(shape, canvas_width, canvas_height)
+        return (self.center_x, self.center_y) != before
@@ -0,0 +1,224 @@
+"""监视投放目录：扫描仪等写入的新图片稳定后自动二值化
+
+只使用标准库，以轮询方式扫描目录（inotify 等需要第三方库）：
+文件大小和修改时间在 settle_time 秒内保持不变才视为写入完成。
+处理结果记录在 SQLite 台账中（路径、修改时间、大小、内容哈希、阈值参数和灰度转换方式），
+重启后修改时间未变且输出仍然存在的文件直接跳过；修改时间变了但内容哈希相同的文件也不会重新处理。
+"""
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .batch import iter_image_files, output_path_for, binarize_file
+from .performance import PerformanceProfile
+from .result_cache import GRAY_METHOD, GRAY_DECODE_METHOD, source_digest
+from .thresholds import as_settings
+
+# 台账默认文件名（位于输出目录中）
+LEDGER_NAME = '.binarization_ledger.sqlite'
+
+# 正在写入的临时文件常见的后缀，不处理
+PARTIAL_SUFFIXES = ('.part', '.partial', '.tmp', '.crdownload', '.download')
+
+
+def process_file(input_path, output_path, threshold, known_digest=None, cache=None,
+                 gray_decode=False, engine='standard'):
+    """在工作进程中处理单个文件，返回 (内容哈希, 各阶段耗时)
+
+    内容与台账中记录的哈希相同且输出已存在时不重新处理，耗时返回 None。
+    """
+    digest = source_digest(input_path)  # 带进程内记忆，启用结果缓存时 binarize_file 不再重复计算
+    if digest == known_digest and os.path.exists(output_path):
+        return digest, None
+    return digest, binarize_file(input_path, output_path, threshold, cache, gray_decode,
+                                 engine=engine)
+
+
+class Ledger:
+    """已处理文件台账（SQLite，只在主线程中访问）"""
+
+    def __init__(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(file_path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, digest TEXT,"
+            " settings TEXT, output TEXT, status TEXT, error TEXT, processed_at REAL)")
+        self.connection.commit()
+
+    def lookup(self, path):
+        """返回台账中的记录（字典），没有时返回 None"""
+        row = self.connection.execute(
+            "SELECT mtime_ns, size, digest, settings, output, status FROM processed WHERE path = ?",
+            (path,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('mtime_ns', 'size', 'digest', 'settings', 'output', 'status'), row))
+
+    def record(self, path, mtime_ns, size, digest, settings, output, status, error=None):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO processed VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, mtime_ns, size, digest, settings, output, status, error, time.time()))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class DirectoryWatcher:
+    """轮询投放目录，把写入完成的新图片交给有界的进程池处理"""
+
+    def __init__(self, input_dir, output_dir, threshold=127, workers=None, recursive=False,
+                 extension='.png', poll_interval=1.0, settle_time=2.0, ledger_path=None,
+                 max_in_flight=None, cache=None, gray_decode=False, engine='standard', profile=None,
+                 log=print):
+        self.input_dir = os.path.abspath(input_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.threshold = threshold
+        # 灰度转换方式与结果缓存键一致；各处理引擎的结果逐位相同，不计入
+        self.settings_key = repr((as_settings(threshold).key(),
+                                  GRAY_DECODE_METHOD if gray_decode else GRAY_METHOD))
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.recursive = recursive
+        self.extension = extension
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.cache = cache
+        self.gray_decode = gray_decode
+        self.engine = engine
+        self.profile = profile or PerformanceProfile.from_env()
+        self.ledger = Ledger(ledger_path or os.path.join(self.output_dir, LEDGER_NAME))
+        self.log = log
+
+        self._observed = {}  # 路径 -> ((大小, 修改时间), 首次观察到该状态的时间)
+        self._pending = {}  # future -> (路径, (大小, 修改时间))
+        self._stopped = False
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def stop(self):
+        """请求停止（可从信号处理函数或其他线程调用）"""
+        self._stopped = True
+
+    def _is_candidate(self, path):
+        name = os.path.basename(path)
+        if name.startswith('.') or name.lower().endswith(PARTIAL_SUFFIXES):
+            return False
+        # 输出目录位于输入目录内时不处理自己的输出
+        return os.path.commonpath([path, self.output_dir]) != self.output_dir
+
+    def scan(self, now=None):
+        """扫描一次目录，返回写入已完成且需要处理的 (路径, 签名, 台账记录) 列表"""
+        now = time.monotonic() if now is None else now
+        in_flight = {path for path, _ in self._pending.values()}
+        ready = []
+        seen = set()
+        for path in iter_image_files(self.input_dir, self.recursive):
+            path = os.path.abspath(path)
+            if not self._is_candidate(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # 扫描期间被移走
+            seen.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+
+            previous = self._observed.get(path)
+            if previous is None or previous[0] != signature:
+                self._observed[path] = (signature, now)
+                continue
+            if stat.st_size == 0 or now - previous[1] < self.settle_time or path in in_flight:
+                continue
+
+            entry = self.ledger.lookup(path)
+            if self._is_current(entry, signature, path):
+                continue
+            ready.append((path, signature, entry))
+
+        # 已删除的文件不再跟踪
+        for path in list(self._observed):
+            if path not in seen:
+                del self._observed[path]
+        return ready
+
+    def _is_current(self, entry, signature, path):
+        """台账记录是否仍然有效：参数、大小和修改时间都未变，且输出（含扩展名）仍然存在
+
+        处理失败的文件没有输出，内容和参数不变时同样不再重试。
+        """
+        if (entry is None or entry['settings'] != self.settings_key
+                or (entry['size'], entry['mtime_ns']) != signature):
+            return False
+        if entry['status'] == 'failed':
+            return True
+        target = output_path_for(path, self.input_dir, self.output_dir, self.extension)
+        return entry['output'] == target and os.path.exists(target)
+
+    def _submit(self, executor, path, signature, entry):
+        target = output_path_for(path, self.input_dir, self.output_dir, self.extension)
+        known_digest = entry['digest'] if entry and entry['settings'] == self.settings_key else None
+        future = executor.submit(process_file, path, target, self.threshold, known_digest, self.cache,
+                                 self.gray_decode, self.engine)
+        self._pending[future] = (path, signature)
+
+    def _collect(self, done):
+        for future in done:
+            path, (size, mtime_ns) = self._pending.pop(future)
+            target = output_path_for(path, self.input_dir, self.output_dir, self.extension)
+            try:
+                digest, timings = future.result()
+            except Exception as e:
+                self.failed += 1
+                self.ledger.record(path, mtime_ns, size, None, self.settings_key, target, 'failed', str(e))
+                self.log(f"失败 {path}: {e}")
+                continue
+
+            self.ledger.record(path, mtime_ns, size, digest, self.settings_key, target, 'done')
+            if timings is None:
+                self.skipped += 1
+                self.log(f"内容未变，跳过 {path}")
+            else:
+                self.processed += 1
+                hit = "（缓存命中）" if timings['cache_hit'] else ""
+                self.log(f"{path} → {target}  合计 {timings['total'] * 1000:.1f} ms{hit}")
+
+    def run(self, once=False):
+        """开始监视；once=True 时只处理当前已写入完成的文件后返回"""
+        self.log(f"监视 {self.input_dir}（每 {self.poll_interval:g} s 扫描一次，"
+                 f"文件稳定 {self.settle_time:g} s 后处理）")
+        queue = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers,
+                                     **self.profile.executor_kwargs(self.workers)) as executor:
+                while not self._stopped:
+                    queued = {path for path, _, _ in queue}
+                    queue.extend(item for item in self.scan() if item[0] not in queued)
+                    while queue and len(self._pending) < self.max_in_flight:
+                        self._submit(executor, *queue.pop(0))
+
+                    if self._pending:
+                        done, _ = wait(self._pending, timeout=self.poll_interval,
+                                       return_when=FIRST_COMPLETED)
+                        self._collect(done)
+                    elif once and not queue and not self._waiting_for_settle():
+                        break
+                    else:
+                        time.sleep(self.poll_interval)
+
+                # 停止时等待已提交的任务完成并记入台账
+                if self._pending:
+                    self._collect(wait(self._pending).done)
+        finally:
+            self.ledger.close()
+
+        self.log(f"处理 {self.processed} 张，内容未变跳过 {self.skipped} 张，失败 {self.failed} 张")
+        return {'processed': self.processed, 'skipped': self.skipped, 'failed': self.failed}
+
+    def _waiting_for_settle(self):
+        """是否还有刚出现或仍在写入、尚未稳定的文件"""
+        now = time.monotonic()
+        return any(now - since < self.settle_time for _, since in self._observed.values())
@@ -2,10 +2,11 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import cv2
-import numpy as np
 from PIL import Image, ImageTk
 import os
 
+from image_binarization.binarization_core import BinarizationPipeline
+
 class ImageBinarizationApp:
     def __init__(self, root):
         self.root = root
@@ -17,9 +18,8 @@ class ImageBinarizationApp:
         self.setup_style()
         
         # 初始化变量
-        self.original_image = None
+        self.pipeline = BinarizationPipeline()  # 处理核心（图像数据与计算都在这里）
         self.processed_image = None
-        self.current_image = None
         self.threshold_value = tk.IntVar(value=127)
         self.is_grayscale = tk.BooleanVar(value=False)
         
@@ -182,22 +182,19 @@ class ImageBinarizationApp:
         
         if file_path:
             try:
-                # 使用OpenCV读取图像
-                self.original_image = cv2.imread(file_path)
-                if self.original_image is None:
-                    messagebox.showerror("错误", "无法读取图片文件！")
+                # 读取图像（转换为RGB）
+                try:
+                    original_image = self.pipeline.load(file_path)
+                except ValueError as e:
+                    messagebox.showerror("错误", str(e))
                     return
                 
-                # 转换颜色空间（OpenCV使用BGR，PIL使用RGB）
-                self.original_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2RGB)
-                
                 # 检查是否为灰度图
-                if len(self.original_image.shape) == 3:
+                if len(original_image.shape) == 3:
                     self.is_grayscale.set(False)
                 else:
                     self.is_grayscale.set(True)
                 
-                self.current_image = self.original_image.copy()
                 self.update_image_info()
                 self.process_image()
                 
@@ -206,17 +203,8 @@ class ImageBinarizationApp:
     
     def on_grayscale_change(self):
         """灰度转换选项改变时的处理"""
-        if self.original_image is not None:
-            if self.is_grayscale.get():
-                # 转换为灰度图
-                if len(self.original_image.shape) == 3:
-                    self.current_image = cv2.cvtColor(self.original_image, cv2.COLOR_RGB2GRAY)
-                else:
-                    self.current_image = self.original_image.copy()
-            else:
-                # 使用原图
-                self.current_image = self.original_image.copy()
-            
+        # 二值化总是基于灰度图进行，选项只影响是否重新处理
+        if self.pipeline.original is not None:
             self.process_image()
     
     def on_threshold_change(self, value):
@@ -224,26 +212,22 @@ class ImageBinarizationApp:
         threshold = int(float(value))
         self.threshold_label.config(text=str(threshold))
         
-        if self.current_image is not None:
+        if self.pipeline.original is not None:
             self.process_image()
     
     def process_image(self):
         """处理图像（二值化）"""
-        if self.current_image is None:
+        if self.pipeline.original is None:
             return
         
         try:
             # 确保图像是灰度图
-            if len(self.current_image.shape) == 3:
-                gray_image = cv2.cvtColor(self.current_image, cv2.COLOR_RGB2GRAY)
-            else:
-                gray_image = self.current_image.copy()
+            if self.pipeline.grayscale is None:
+                self.pipeline.to_gray()
             
             # 应用二值化
             threshold = self.threshold_value.get()
-            _, binary_image = cv2.threshold(gray_image, threshold, 255, cv2.THRESH_BINARY)
-            
-            self.processed_image = binary_image
+            self.processed_image = self.pipeline.threshold(threshold)
             self.display_image()
             
         except Exception as e:
@@ -297,23 +281,24 @@ class ImageBinarizationApp:
     
     def update_image_info(self):
         """更新图像信息显示"""
-        if self.original_image is None:
+        original_image = self.pipeline.original
+        if original_image is None:
             return
         
         try:
             info = []
-            if len(self.original_image.shape) == 3:
-                height, width, channels = self.original_image.shape
+            if len(original_image.shape) == 3:
+                height, width, channels = original_image.shape
                 info.append(f"尺寸: {width} × {height}")
                 info.append(f"通道数: {channels}")
                 info.append(f"类型: 彩色图像")
             else:
-                height, width = self.original_image.shape
+                height, width = original_image.shape
                 info.append(f"尺寸: {width} × {height}")
                 info.append(f"类型: 灰度图像")
             
-            info.append(f"数据类型: {self.original_image.dtype}")
-            info.append(f"像素范围: {self.original_image.min()} - {self.original_image.max()}")
+            info.append(f"数据类型: {original_image.dtype}")
+            info.append(f"像素范围: {original_image.min()} - {original_image.max()}")
             
             # 更新信息显示
             self.info_text.config(state=tk.NORMAL)
@@ -345,7 +330,7 @@ class ImageBinarizationApp:
         
         if file_path:
             try:
-                cv2.imwrite(file_path, self.processed_image)
+                self.pipeline.save(file_path, self.threshold_value.get())
                 messagebox.showinfo("成功", "图像保存成功！")
             except Exception as e:
                 messagebox.showerror("错误", f"保存图像时发生错误: {str(e)}")
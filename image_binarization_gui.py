@@ -4,6 +4,110 @@ import cv2
 import numpy as np
 from PIL import Image, ImageTk
 import os
+import time
+
+from image_binarization.batch import BatchJob, iter_image_files
+from image_binarization.binarization_core import (
+    BinarizationPipeline,
+    read_preview, load_display_color, gray_and_histogram, pack_cached, write_binary,
+    threshold_sweep, write_sweep_csv)
+from image_binarization.instrumentation import Instrumentation, TRACE_ENV, current_rss_bytes
+from image_binarization.performance import PerformanceProfile, format_hardware_report
+from image_binarization.pyramid import ImagePyramid
+from image_binarization.result_cache import GRAY_DECODE_METHOD, ResultCache
+from image_binarization.session import THUMBNAIL_SIDE, ImageSession, decode_image
+from image_binarization.thresholds import (
+    THRESHOLD_MODES, LOCAL_MODES, DEFAULT_K, ThresholdSettings, odd_window, local_binarize,
+    otsu_threshold)
+from image_binarization.tasks import LatestWinsExecutor
+from image_binarization.viewport import Viewport
+
+# 后台预先生成预览金字塔，直到最长边不超过该值
+PREVIEW_PYRAMID_SIDE = 256
+
+# 先显示缩小解码的预览图时，预览图最长边至少为该值（足够填满画布）
+PREVIEW_DECODE_SIDE = 700
+
+# 缩略图条带中每个缩略图占用的宽度（像素）
+THUMBNAIL_PITCH = THUMBNAIL_SIDE + 12
+
+# 滑块等交互的渲染间隔（毫秒）：两帧之间到达的事件只保留最新的值
+FRAME_INTERVAL_MS = 16
+
+# 性能浮层的刷新间隔（毫秒）
+OVERLAY_REFRESH_MS = 500
+
+
+class CanvasRenderTarget:
+    """画布的持久渲染目标：一个画布图像项和一个按尺寸分配的 PhotoImage
+
+    像素通过 PhotoImage.paste 原地更新，只有显示尺寸或颜色模式变化时才重新分配；
+    二值化预览可直接写入 buffer_for() 返回的缓冲区（与一个 PIL 图像共享内存），
+    这样拖动滑块时既不分配 numpy 数组，也不分配 PIL/Tk 图像。
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.item = None
+        self.photo = None
+        self.photo_key = None  # (模式, 宽, 高)
+        self.position = None
+        self._photo_changed = False
+        self.buffer = None
+        self.buffer_view = None  # 与 buffer 共享内存的 PIL 'L' 图像
+        self.allocations = 0
+
+    def buffer_for(self, shape):
+        """返回指定尺寸的单通道 uint8 缓冲区（尺寸不变时始终是同一个数组）"""
+        if self.buffer is None or self.buffer.shape != shape:
+            height, width = shape
+            self.buffer = np.empty((height, width), dtype=np.uint8)
+            self.buffer_view = Image.frombuffer('L', (width, height), self.buffer, 'raw', 'L', 0, 1)
+        return self.buffer
+
+    def update(self, image):
+        """把像素写入 PhotoImage，返回是否重新分配了 PhotoImage"""
+        height, width = image.shape[:2]
+        mode = 'L' if image.ndim == 2 else 'RGB'
+        reallocated = self.photo is None or self.photo_key != (mode, width, height)
+        if reallocated:
+            self.photo = ImageTk.PhotoImage(mode, (width, height))
+            self.photo_key = (mode, width, height)
+            self.allocations += 1
+
+        source = self.buffer_view if image is self.buffer else Image.fromarray(image)
+        self.photo.paste(source)
+        self._photo_changed = self._photo_changed or reallocated
+        return reallocated
+
+    def place(self):
+        """让画布图像项显示当前的 PhotoImage 并居中（只在需要时修改画布项）"""
+        _, width, height = self.photo_key
+        position = ((self.canvas.winfo_width() - width) // 2, (self.canvas.winfo_height() - height) // 2)
+        if self.item is None:
+            self.item = self.canvas.create_image(*position, anchor=tk.NW, image=self.photo)
+        else:
+            if self._photo_changed:
+                self.canvas.itemconfigure(self.item, image=self.photo)
+            if position != self.position:
+                self.canvas.coords(self.item, *position)
+        self._photo_changed = False
+        self.position = position
+
+    def clear(self):
+        """删除画布图像项并释放 PhotoImage（画布被清空时调用）"""
+        if self.item is not None:
+            self.canvas.delete(self.item)
+        self.item = None
+        self.photo = None
+        self.photo_key = None
+        self.position = None
+        self._photo_changed = False
+
+    @property
+    def showing(self):
+        return self.item is not None
+
 
 class ImageBinarizationApp:
     def __init__(self, root):
@@ -16,13 +120,67 @@ class ImageBinarizationApp:
         self.setup_style()
         
         # 初始化变量
-        self.original_image = None
-        self.backup_original = None  # 备份原始图像用于恢复
-        self.grayscale_image = None
-        self.binary_image = None
+        # 处理核心（图像数据与计算都在这里）；同一文件、同一裁剪和阈值参数的结果缓存在磁盘上
+        self.pipeline = BinarizationPipeline(result_cache=self.create_result_cache())
         self.threshold_value = tk.IntVar(value=127)
+        self.threshold_mode = tk.StringVar(value=THRESHOLD_MODES['global'])  # 显示名称
+        self.window_value = tk.IntVar(value=31)  # 局部阈值窗口大小（奇数）
+        self.k_value = tk.DoubleVar(value=DEFAULT_K['sauvola'])  # Sauvola/Niblack 的 k
+        self.offset_value = tk.DoubleVar(value=2)  # 自适应阈值的偏移量 C
         self.current_stage = "none"  # none, original, grayscale, binary
         
+        # 交互式预览缓存（按画布尺寸缩放后的灰度图，滑块只在它上面查表）
+        self.preview_gray = None
+        self.preview_source = None
+        self.preview_size = None  # (画布尺寸, 视口)
+        self.preview_scale = 1.0  # 预览图相对灰度图的缩放比例（局部阈值窗口按它缩小）
+        
+        # 三个面板共享的平移/缩放视口
+        self.viewport = Viewport()
+        self.view_dirty = False
+        self.pan_start = None
+        
+        # 每个画布的显示缓存：{画布: (源图像, 画布尺寸, 缩放后的图像)}
+        self.display_cache = {}
+        self.render_targets = {}  # 画布 -> CanvasRenderTarget
+        self.resize_after_id = None  # 窗口缩放防抖的 after id
+        
+        # 交互渲染调度：每个显示帧最多渲染一次，事件只记录“需要重绘”
+        self.render_after_id = None
+        self.last_frame_time = 0.0
+        self.rendered_frame_key = None  # 最近一次渲染的 (阈值参数, 画布尺寸, 灰度图)
+        
+        # 正在读取的图片（缩小解码的预览只在原图读取完成前显示）
+        self.loading_path = None
+        self.loading_grayscale = False
+        self.loading_started = None
+        
+        # 灰度导入：直接解码为灰度，彩色图只按需读取一个缩小版本用于显示
+        self.gray_ingest = tk.BooleanVar(value=False)
+        self.color_display = None  # (原图缓冲区, 彩色显示图)
+        self.preview_display = None  # (路径, 缩小解码的彩色预览图)，原图读取完成后转为 color_display
+        self.color_display_pending = None  # (原图缓冲区, 取消令牌)：正在后台读取的彩色显示图
+        
+        # 多图会话（打开多张时创建）与缩略图条带上当前显示的 PhotoImage
+        self.session = None
+        self.thumbnail_photos = {}
+        
+        # 正在运行的“应用到文件夹”批量任务
+        self.batch_job = None
+        
+        # 阈值扫描窗口（matplotlib 图表，首次打开时才导入）
+        self.sweep_window = None
+        
+        # 后台任务（解码、灰度转换、全分辨率二值化、保存都不在界面线程中执行）
+        self.executor = LatestWinsExecutor()
+        self.progress_running = False
+        
+        # 性能插桩（默认关闭；设置 IMAGE_BINARIZATION_TRACE=文件路径 时启动即开启并在退出时写出跟踪文件）
+        self.trace_path = os.environ.get(TRACE_ENV)
+        self.instrumentation = Instrumentation(enabled=bool(self.trace_path), tracing=bool(self.trace_path))
+        self.overlay_value = tk.BooleanVar(value=bool(self.trace_path))
+        self.overlay_after_id = None
+        
         # 裁剪相关变量
         self.crop_mode = False
         self.crop_start = None
@@ -35,6 +193,20 @@ class ImageBinarizationApp:
         # 绑定窗口大小变化事件
         self.root.bind('<Configure>', self.on_window_resize)
         
+        # 关闭窗口时停止后台任务
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 定时处理后台任务结果
+        self.poll_background_results()
+        
+    def create_result_cache(self):
+        """创建磁盘结果缓存，缓存目录不可用时不使用缓存"""
+        try:
+            return ResultCache()
+        except OSError as e:
+            print(f"结果缓存不可用: {str(e)}")
+            return None
+    
     def setup_style(self):
         """设置现代化UI样式"""
         style = ttk.Style()
@@ -155,6 +327,14 @@ class ImageBinarizationApp:
                                   style='Modern.TButton', state='disabled')
         self.save_btn.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
         
+        self.open_many_btn = ttk.Button(button_frame, text="打开多张...",
+                                        command=self.open_session, style='Modern.TButton')
+        self.open_many_btn.grid(row=2, column=0, sticky=(tk.W, tk.E), padx=(0, 5), pady=(8, 0))
+        
+        ttk.Checkbutton(button_frame, text="灰度导入（更快，省内存）", variable=self.gray_ingest,
+                        style='Modern.TCheckbutton').grid(row=2, column=1, sticky=tk.W,
+                                                          padx=(5, 0), pady=(8, 0))
+        
         # 图像编辑功能区域
         edit_frame = ttk.LabelFrame(control_frame, text="图像编辑功能", padding="10")
         edit_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -173,6 +353,17 @@ class ImageBinarizationApp:
                                      style='Modern.TButton', state='disabled')
         self.restore_btn.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
         
+        # 撤销/重做按钮
+        self.undo_btn = ttk.Button(edit_frame, text="↶ 撤销", 
+                                  command=self.undo_edit, 
+                                  style='Modern.TButton', state='disabled')
+        self.undo_btn.grid(row=1, column=0, sticky=(tk.W, tk.E), padx=(0, 5), pady=(5, 0))
+        
+        self.redo_btn = ttk.Button(edit_frame, text="↷ 重做", 
+                                  command=self.redo_edit, 
+                                  style='Modern.TButton', state='disabled')
+        self.redo_btn.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=(5, 0), pady=(5, 0))
+        
         # 阈值调整区域
         threshold_frame = ttk.LabelFrame(control_frame, text="二值化阈值调整", padding="10")
         threshold_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -213,6 +404,12 @@ class ImageBinarizationApp:
         self.ratio_label = ttk.Label(stats_frame, text="--", style='Info.TLabel')
         self.ratio_label.grid(row=4, column=1, sticky=tk.W, padx=(10, 0))
         
+        # 阈值扫描：一次得到全部 256 个阈值下的黑白占比曲线
+        self.sweep_btn = ttk.Button(stats_frame, text="📈 阈值扫描曲线",
+                                   command=self.show_threshold_sweep,
+                                   style='Modern.TButton', state='disabled')
+        self.sweep_btn.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        
         # 阈值说明
         self.threshold_info = ttk.Label(threshold_frame, text="请先完成前面的步骤", 
                                        style='Info.TLabel', foreground='#95a5a6')
@@ -231,6 +428,83 @@ class ImageBinarizationApp:
                                         state='disabled')
         self.threshold_scale.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
         
+        # 阈值模式
+        ttk.Label(threshold_frame, text="模式:", style='Subtitle.TLabel').grid(row=3, column=0, sticky=tk.W, pady=(10, 0))
+        self.mode_combo = ttk.Combobox(threshold_frame, textvariable=self.threshold_mode,
+                                       values=list(THRESHOLD_MODES.values()), state='readonly')
+        self.mode_combo.grid(row=3, column=1, columnspan=2, sticky=(tk.W, tk.E), padx=(10, 0), pady=(10, 0))
+        self.mode_combo.bind('<<ComboboxSelected>>', self.on_mode_change)
+        
+        # 局部窗口大小
+        ttk.Label(threshold_frame, text="窗口大小:", style='Subtitle.TLabel').grid(row=4, column=0, sticky=tk.W, pady=(10, 0))
+        self.window_label = ttk.Label(threshold_frame, text="31", style='Subtitle.TLabel')
+        self.window_label.grid(row=4, column=2, sticky=tk.E, pady=(10, 0))
+        
+        self.window_scale = ttk.Scale(threshold_frame, from_=3, to=201,
+                                     variable=self.window_value,
+                                     orient=tk.HORIZONTAL,
+                                     command=self.on_window_change,
+                                     state='disabled')
+        self.window_scale.grid(row=5, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(5, 0))
+        
+        # k 值（Sauvola/Niblack）与偏移量 C（自适应阈值）
+        ttk.Label(threshold_frame, text="k 值:", style='Subtitle.TLabel').grid(row=6, column=0, sticky=tk.W, pady=(10, 0))
+        self.k_spin = ttk.Spinbox(threshold_frame, from_=-1.0, to=1.0, increment=0.05,
+                                  textvariable=self.k_value, width=8,
+                                  command=self.on_threshold_params_change, state='disabled')
+        self.k_spin.grid(row=6, column=1, sticky=tk.W, padx=(10, 0), pady=(10, 0))
+        
+        ttk.Label(threshold_frame, text="偏移量 C:", style='Subtitle.TLabel').grid(row=7, column=0, sticky=tk.W, pady=(5, 0))
+        self.offset_spin = ttk.Spinbox(threshold_frame, from_=-50, to=50, increment=1,
+                                       textvariable=self.offset_value, width=8,
+                                       command=self.on_threshold_params_change, state='disabled')
+        self.offset_spin.grid(row=7, column=1, sticky=tk.W, padx=(10, 0), pady=(5, 0))
+        
+        for spin in (self.k_spin, self.offset_spin):
+            spin.bind('<Return>', self.on_threshold_params_change)
+            spin.bind('<FocusOut>', self.on_threshold_params_change)
+        
+        # 后台任务进度区域
+        progress_frame = ttk.LabelFrame(control_frame, text="后台任务", padding="10")
+        progress_frame.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        progress_frame.columnconfigure(0, weight=1)
+        
+        self.progress_label = ttk.Label(progress_frame, text="就绪", style='Info.TLabel')
+        self.progress_label.grid(row=0, column=0, sticky=tk.W)
+        
+        self.progress_bar = ttk.Progressbar(progress_frame, mode='indeterminate')
+        self.progress_bar.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        
+        # 性能监视：浮层开关与跟踪文件导出
+        perf_frame = ttk.Frame(progress_frame)
+        perf_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        ttk.Checkbutton(perf_frame, text="显示性能浮层", variable=self.overlay_value,
+                        command=self.toggle_performance_overlay,
+                        style='Modern.TCheckbutton').grid(row=0, column=0, sticky=tk.W)
+        ttk.Button(perf_frame, text="导出跟踪文件", command=self.export_trace).grid(row=0, column=1, sticky=tk.W, padx=(10, 0))
+        
+        # 批量处理：把当前的裁剪、灰度和阈值参数应用到整个文件夹
+        batch_frame = ttk.LabelFrame(control_frame, text="批量处理", padding="10")
+        batch_frame.grid(row=5, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
+        batch_frame.columnconfigure(0, weight=1)
+        batch_frame.columnconfigure(1, weight=1)
+        
+        self.apply_folder_btn = ttk.Button(batch_frame, text="应用到文件夹...",
+                                           command=self.apply_to_folder,
+                                           style='Modern.TButton', state='disabled')
+        self.apply_folder_btn.grid(row=0, column=0, sticky=(tk.W, tk.E), padx=(0, 5))
+        
+        self.cancel_batch_btn = ttk.Button(batch_frame, text="取消",
+                                           command=self.cancel_batch_job,
+                                           style='Modern.TButton', state='disabled')
+        self.cancel_batch_btn.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(5, 0))
+        
+        self.batch_progress = ttk.Progressbar(batch_frame, mode='determinate')
+        self.batch_progress.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
+        
+        self.batch_info = ttk.Label(batch_frame, text="调好阈值后可批量处理整个文件夹", style='Info.TLabel')
+        self.batch_info.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        
     def create_image_display_area(self, parent):
         """创建图像显示区域"""
         display_frame = ttk.LabelFrame(parent, text="图像处理过程", padding="10")
@@ -248,6 +522,46 @@ class ImageBinarizationApp:
         
         # 二值化图显示
         self.create_image_panel(display_frame, 2, "二值化结果", "binary")
+        
+        # 多图会话的缩略图条带
+        self.create_thumbnail_strip(display_frame)
+        
+        # 性能浮层（叠加在显示区域右上角，开启时才显示）
+        self.overlay_label = tk.Label(display_frame, text="", justify=tk.LEFT, anchor='nw',
+                                      font=('Consolas', 9), bg='#2c3e50', fg='#ecf0f1',
+                                      padx=6, pady=4)
+        if self.overlay_value.get():
+            self.root.after(0, self.toggle_performance_overlay)
+    
+    def create_thumbnail_strip(self, parent):
+        """创建缩略图条带（只为可见范围内的缩略图创建画布项）"""
+        strip_frame = ttk.Frame(parent)
+        strip_frame.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        strip_frame.columnconfigure(1, weight=1)
+        
+        self.prev_page_btn = ttk.Button(strip_frame, text="◀", width=3, state='disabled',
+                                        command=lambda: self.step_page(-1))
+        self.prev_page_btn.grid(row=0, column=0, sticky=(tk.N, tk.S), padx=(0, 5))
+        
+        self.thumbnail_canvas = tk.Canvas(strip_frame, bg='#f8f9fa', relief=tk.SUNKEN, bd=1,
+                                          height=THUMBNAIL_SIDE + 24, highlightthickness=0)
+        self.thumbnail_canvas.grid(row=0, column=1, sticky=(tk.W, tk.E))
+        
+        self.next_page_btn = ttk.Button(strip_frame, text="▶", width=3, state='disabled',
+                                        command=lambda: self.step_page(1))
+        self.next_page_btn.grid(row=0, column=2, sticky=(tk.N, tk.S), padx=(5, 0))
+        
+        scrollbar = ttk.Scrollbar(strip_frame, orient=tk.HORIZONTAL, command=self.scroll_thumbnails)
+        scrollbar.grid(row=1, column=1, sticky=(tk.W, tk.E))
+        self.thumbnail_canvas.configure(xscrollcommand=scrollbar.set)
+        
+        self.page_info = ttk.Label(strip_frame, text="打开多张图片后可在此翻页", style='Info.TLabel')
+        self.page_info.grid(row=2, column=1, pady=(2, 0))
+        
+        self.thumbnail_canvas.bind('<Button-1>', self.on_thumbnail_click)
+        self.thumbnail_canvas.bind('<Configure>', lambda event: self.render_thumbnail_strip())
+        self.root.bind('<Prior>', lambda event: self.step_page(-1))
+        self.root.bind('<Next>', lambda event: self.step_page(1))
     
     def create_image_panel(self, parent, column, title, panel_type):
         """创建单个图像显示面板"""
@@ -261,6 +575,14 @@ class ImageBinarizationApp:
         canvas = tk.Canvas(panel_frame, bg='#f8f9fa', relief=tk.SUNKEN, bd=1, height=400)
         canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
+        # 滚轮缩放、拖动平移、双击恢复适应画布（三个面板同步）
+        canvas.bind('<MouseWheel>', lambda event: self.on_view_zoom(event, canvas))
+        canvas.bind('<Button-4>', lambda event: self.on_view_zoom(event, canvas))
+        canvas.bind('<Button-5>', lambda event: self.on_view_zoom(event, canvas))
+        canvas.bind('<ButtonPress-1>', self.on_pan_start)
+        canvas.bind('<B1-Motion>', lambda event: self.on_pan_move(event, canvas))
+        canvas.bind('<Double-Button-1>', self.on_view_reset)
+        
         # 图像信息标签
         info_label = ttk.Label(panel_frame, text="暂无图像", 
                               style='Info.TLabel', anchor='center')
@@ -292,58 +614,256 @@ class ImageBinarizationApp:
         )
         
         if file_path:
-            try:
-                # 使用OpenCV读取图像
-                self.original_image = cv2.imread(file_path)
-                if self.original_image is None:
-                    messagebox.showerror("错误", "无法读取图片文件！")
-                    return
-                
-                # 转换颜色空间（OpenCV使用BGR，PIL使用RGB）
-                self.original_image = cv2.cvtColor(self.original_image, cv2.COLOR_BGR2RGB)
-                
-                # 备份原始图像
-                self.backup_original = self.original_image.copy()
-                
-                # 重置状态
-                self.grayscale_image = None
-                self.binary_image = None
-                self.current_stage = "original"
-                
-                # 清除其他画布
-                self.clear_canvas(self.grayscale_canvas)
-                self.clear_canvas(self.binary_canvas)
-                self.grayscale_info.config(text="暂无图像")
-                self.binary_info.config(text="暂无图像")
-                
-                # 显示原图
-                self.display_image_on_canvas(self.original_image, self.original_canvas, self.original_info)
-                
-                # 更新按钮状态
-                self.update_button_states()
-                
-            except Exception as e:
+            # 单张导入时结束多图会话
+            self.close_session()
+            grayscale = self.gray_ingest.get()
+            with_digest = self.pipeline.result_cache is not None
+            
+            def load_job(token, path):
+                # 超大图片以内存映射分块模式打开，灰度导入时直接解码为单通道；
+                # 预览金字塔也在后台生成（编辑历史共享原图缓冲区，无需备份），内容哈希作为结果缓存的键
+                return decode_image(path, grayscale, PREVIEW_PYRAMID_SIDE, with_digest, token.check)
+            
+            self.start_loading(file_path, grayscale, load_job)
+    
+    def start_loading(self, file_path, grayscale, load_job):
+        """在后台读取图片：先显示缩小解码的预览，load_job 完成后显示原图"""
+        # 新图像到来时，旧图像上的后台任务全部作废
+        self.cancel_image_jobs()
+        self.preview_display = None
+        self.loading_path = file_path
+        self.loading_grayscale = grayscale
+        self.loading_started = time.perf_counter()
+        
+        # 先缩小解码（JPEG 按 1/2~1/8 直接解码）立即显示，完整解码同时在后台进行
+        def preview_job(token, path):
+            return path, read_preview(path, PREVIEW_DECODE_SIDE)
+        
+        self.executor.submit("preview", preview_job, file_path,
+                             on_done=self.on_preview_loaded,
+                             on_error=lambda e: print(f"读取预览图时发生错误: {str(e)}"))
+        
+        def on_error(e):
+            self.loading_path = None
+            if isinstance(e, ValueError):
+                messagebox.showerror("错误", str(e))
+            else:
                 messagebox.showerror("错误", f"读取图片时发生错误: {str(e)}")
+        
+        self.executor.submit("image", load_job, file_path, label="读取图片",
+                             on_done=self.on_image_loaded, on_error=on_error)
+    
+    def open_session(self):
+        """打开多张图片：缩略图条带翻页，后台预取后面几张"""
+        file_types = [
+            ('图片文件', '*.png *.jpg *.jpeg *.bmp *.tiff *.gif'),
+            ('所有文件', '*.*')
+        ]
+        file_paths = filedialog.askopenfilenames(title="选择多张图片", filetypes=file_types)
+        if not file_paths:
+            return
+        
+        self.close_session()
+        self.session = ImageSession(file_paths, grayscale=self.gray_ingest.get(),
+                                    pyramid_side=PREVIEW_PYRAMID_SIDE,
+                                    with_digest=self.pipeline.result_cache is not None)
+        self.thumbnail_canvas.configure(scrollregion=(0, 0, len(self.session) * THUMBNAIL_PITCH,
+                                                      THUMBNAIL_SIDE + 24))
+        self.thumbnail_canvas.xview_moveto(0)
+        self.show_page(0)
+    
+    def close_session(self):
+        """结束多图会话，释放已解码的图片和缩略图"""
+        if self.session is None:
+            return
+        self.session.close()
+        self.session = None
+        self.thumbnail_photos.clear()
+        self.thumbnail_canvas.delete("all")
+        self.page_info.config(text="打开多张图片后可在此翻页")
+        self.prev_page_btn.config(state='disabled')
+        self.next_page_btn.config(state='disabled')
+    
+    def step_page(self, step):
+        if self.session is not None:
+            self.show_page(self.session.index + step)
+    
+    def show_page(self, index):
+        """切换到会话中的第 index 张：已预取时立即显示，否则在后台读取"""
+        session = self.session
+        if session is None or not 0 <= index < len(session):
+            return
+        if self.crop_window is not None:
+            self.cancel_crop()
+        session.go_to(index)
+        
+        self.page_info.config(text=f"第 {index + 1} / {len(session)} 张  {os.path.basename(session.current_path)}")
+        self.prev_page_btn.config(state='normal' if index > 0 else 'disabled')
+        self.next_page_btn.config(state='normal' if index < len(session) - 1 else 'disabled')
+        self.scroll_to_thumbnail(index)
+        
+        decoded = session.cached(index)
+        if decoded is not None:
+            self.cancel_image_jobs()
+            self.preview_display = None  # 没有预览图，彩色显示图按需读取
+            self.loading_path = None
+            self.instrumentation.count('page_hit')
+            self.on_image_loaded(decoded)
+            return
+        
+        self.instrumentation.count('page_miss')
+        self.start_loading(session.current_path, session.grayscale,
+                           lambda token, path: session.load(index, token.check))
+    
+    def scroll_thumbnails(self, *args):
+        """滚动条拖动/点击：滚动后重新生成可见范围内的缩略图"""
+        self.thumbnail_canvas.xview(*args)
+        self.render_thumbnail_strip()
+    
+    def scroll_to_thumbnail(self, index):
+        """当前页的缩略图不在可见范围内时滚动到它"""
+        canvas = self.thumbnail_canvas
+        left = canvas.canvasx(0)
+        right = left + canvas.winfo_width()
+        x = index * THUMBNAIL_PITCH
+        if x < left or x + THUMBNAIL_PITCH > right:
+            total = len(self.session) * THUMBNAIL_PITCH
+            canvas.xview_moveto(max(0, x - (right - left - THUMBNAIL_PITCH) / 2) / total)
+        self.render_thumbnail_strip()
+    
+    def visible_thumbnail_range(self):
+        """可见范围内的缩略图索引（左右各多算一个，滚动时不露白）"""
+        canvas = self.thumbnail_canvas
+        left = canvas.canvasx(0)
+        first = max(0, int(left // THUMBNAIL_PITCH) - 1)
+        last = min(len(self.session), int((left + canvas.winfo_width()) // THUMBNAIL_PITCH) + 2)
+        return range(first, last)
+    
+    def render_thumbnail_strip(self):
+        """重绘缩略图条带：只为可见的缩略图创建画布项和 PhotoImage，其余的立即释放"""
+        if self.session is None:
+            return
+        canvas = self.thumbnail_canvas
+        visible = self.visible_thumbnail_range()
+        self.session.request_thumbnails(visible)
+        
+        canvas.delete("all")
+        photos = {}
+        for index in visible:
+            x = index * THUMBNAIL_PITCH + THUMBNAIL_PITCH // 2
+            if index == self.session.index:
+                canvas.create_rectangle(x - THUMBNAIL_PITCH // 2 + 2, 2, x + THUMBNAIL_PITCH // 2 - 2,
+                                        THUMBNAIL_SIDE + 20, outline='#3498db', width=2)
+            photo = self.thumbnail_photos.get(index)
+            if photo is None:
+                thumbnail = self.session.thumbnail(index)
+                if thumbnail is not None:
+                    photo = ImageTk.PhotoImage(Image.fromarray(thumbnail))
+            if photo is not None:
+                photos[index] = photo
+                canvas.create_image(x, THUMBNAIL_SIDE // 2 + 6, image=photo)
+            else:
+                canvas.create_text(x, THUMBNAIL_SIDE // 2 + 6, text="…", fill='#95a5a6')
+            canvas.create_text(x, THUMBNAIL_SIDE + 14, text=str(index + 1), fill='#7f8c8d',
+                               font=('Microsoft YaHei UI', 8))
+        self.thumbnail_photos = photos
+    
+    def on_thumbnail_click(self, event):
+        if self.session is None:
+            return
+        index = int(self.thumbnail_canvas.canvasx(event.x) // THUMBNAIL_PITCH)
+        if index != self.session.index:
+            self.show_page(index)
+    
+    def on_preview_loaded(self, result):
+        """缩小解码的预览图读取完成（界面线程）：原图仍在读取时先显示预览"""
+        path, preview = result
+        if preview is None or path != self.loading_path:
+            return
+        
+        image, (width, height), factor = preview
+        if self.loading_grayscale:
+            # 灰度导入时缩小解码的彩色预览图就是原图面板的显示图（原图缓冲区读取完成后再关联）
+            self.preview_display = (path, image)
+        self.record_first_pixel()
+        self.clear_canvas(self.grayscale_canvas)
+        self.clear_canvas(self.binary_canvas)
+        self.display_image_on_canvas(image, self.original_canvas, self.original_info)
+        self.original_info.config(text=f"{width} × {height}（1/{factor} 预览，正在读取原图...）")
+    
+    def record_first_pixel(self):
+        """记录从选择文件到第一次显示图像的时间（性能插桩）"""
+        if self.loading_started is not None:
+            self.instrumentation.record('first_pixel', self.loading_started,
+                                        time.perf_counter() - self.loading_started)
+            self.loading_started = None
+    
+    def on_image_loaded(self, result):
+        """图片在后台读取完成后的处理（界面线程），result 为 DecodedImage"""
+        self.executor.cancel("preview")
+        self.loading_path = None
+        if self.session is not None and result.path != self.session.current_path:
+            return  # 读取期间已翻到别的页面
+        try:
+            self.record_first_pixel()
+            image = result.image
+            self.pipeline.set_image(image, result.digest, result.path, result.grayscale)
+            self.pipeline.adopt_pyramid('original', result.pyramid)
+            preview, self.preview_display = self.preview_display, None
+            if result.grayscale and preview is not None and preview[0] == result.path:
+                self.color_display = (image, preview[1])
+                self.display_cache.pop(self.original_canvas, None)  # 同一显示图，但信息标签要更新
+            else:
+                self.color_display = None
+            
+            # 显示原图并重置后续处理结果
+            self.on_original_changed()
+            
+        except Exception as e:
+            messagebox.showerror("错误", f"读取图片时发生错误: {str(e)}")
     
     def convert_to_grayscale(self):
         """转换为灰度图"""
-        if self.original_image is None:
+        if self.pipeline.original is None:
             messagebox.showwarning("警告", "请先导入图片！")
             return
         
+        source = self.pipeline.original
+        
+        def gray_job(token, image):
+            # 只统计一次直方图，之后任意阈值的像素统计都基于它
+            gray_image, histogram = gray_and_histogram(image, check=token.check)
+            token.check()
+            if gray_image is image:
+                return image, gray_image, histogram, None  # 灰度导入：直接使用原图的金字塔
+            pyramid = ImagePyramid(gray_image).prebuild(PREVIEW_PYRAMID_SIDE)
+            return image, gray_image, histogram, pyramid
+        
+        def on_error(e):
+            self.update_button_states()
+            messagebox.showerror("错误", f"转换灰度图时发生错误: {str(e)}")
+        
+        # 防止重复提交
+        self.grayscale_btn.config(state='disabled')
+        self.executor.submit("grayscale", gray_job, source, label="转换灰度图",
+                             on_done=self.on_grayscale_ready, on_error=on_error)
+    
+    def on_grayscale_ready(self, result):
+        """灰度图在后台计算完成后的处理（界面线程）"""
+        image, gray_image, histogram, pyramid = result
+        if image is not self.pipeline.original:
+            # 计算期间原图已被替换（重新导入/裁剪/恢复），结果作废
+            return
+        
         try:
-            # 检查是否已经是灰度图
-            if len(self.original_image.shape) == 2:
-                self.grayscale_image = self.original_image.copy()
-            else:
-                # 转换为灰度图
-                self.grayscale_image = cv2.cvtColor(self.original_image, cv2.COLOR_RGB2GRAY)
+            self.pipeline.set_grayscale(gray_image, histogram)
+            self.pipeline.adopt_pyramid('grayscale', pyramid)
             
             # 更新状态
             self.current_stage = "grayscale"
             
             # 显示灰度图
-            self.display_image_on_canvas(self.grayscale_image, self.grayscale_canvas, self.grayscale_info)
+            self.display_image_on_canvas(self.pipeline.grayscale, self.grayscale_canvas, self.grayscale_info)
             
             # 更新按钮状态
             self.update_button_states()
@@ -353,15 +873,15 @@ class ImageBinarizationApp:
     
     def enable_binarization(self):
         """启用二值化功能"""
-        if self.grayscale_image is None:
+        if self.pipeline.grayscale is None:
             messagebox.showwarning("警告", "请先转换为灰度图！")
             return
         
         # 更新状态
         self.current_stage = "binary"
         
-        # 启用阈值滑块
-        self.threshold_scale.config(state='normal')
+        # 按当前模式启用阈值相关控件
+        self.update_threshold_controls()
         self.threshold_info.config(text="拖动滑块调整阈值，实时查看二值化效果", foreground='#27ae60')
         
         # 执行初始二值化
@@ -372,7 +892,7 @@ class ImageBinarizationApp:
     
     def start_crop_mode(self):
         """开始裁剪模式"""
-        if self.original_image is None:
+        if self.pipeline.original is None:
             messagebox.showwarning("警告", "请先导入图片！")
             return
         
@@ -439,7 +959,7 @@ class ImageBinarizationApp:
     
     def display_crop_image(self):
         """在裁剪窗口显示原图"""
-        if self.original_image is None:
+        if self.pipeline.original is None:
             return
         
         # 获取画布大小
@@ -452,7 +972,7 @@ class ImageBinarizationApp:
             return
         
         # 计算缩放比例（稍微放大以便精确选择）
-        img_height, img_width = self.original_image.shape[:2]
+        img_height, img_width = self.pipeline.original.shape[:2]
         scale_x = (canvas_width - 40) / img_width
         scale_y = (canvas_height - 40) / img_height
         self.crop_scale = min(scale_x, scale_y, 2.0)  # 最大放大2倍
@@ -460,9 +980,9 @@ class ImageBinarizationApp:
         new_width = int(img_width * self.crop_scale)
         new_height = int(img_height * self.crop_scale)
         
-        # 调整图像大小
-        resized_image = cv2.resize(self.original_image, (new_width, new_height), 
-                                 interpolation=cv2.INTER_CUBIC)
+        # 调整图像大小（缩小时从金字塔中最接近的层级缩放）
+        resized_image = self.pipeline.pyramid('original').resize(new_width, new_height,
+                                                                  interpolation=cv2.INTER_CUBIC)
         
         # 转换为PIL图像
         pil_image = Image.fromarray(resized_image)
@@ -546,45 +1066,18 @@ class ImageBinarizationApp:
             orig_x2 = int((x2 - self.crop_offset_x) / self.crop_scale)
             orig_y2 = int((y2 - self.crop_offset_y) / self.crop_scale)
             
-            # 确保坐标在图像范围内
-            img_height, img_width = self.original_image.shape[:2]
-            orig_x1 = max(0, min(orig_x1, img_width-1))
-            orig_y1 = max(0, min(orig_y1, img_height-1))
-            orig_x2 = max(0, min(orig_x2, img_width))
-            orig_y2 = max(0, min(orig_y2, img_height))
-            
-            # 检查裁剪区域大小
-            if orig_x2 - orig_x1 < 10 or orig_y2 - orig_y1 < 10:
-                messagebox.showwarning("警告", "裁剪区域太小！")
+            # 执行裁剪（坐标范围与区域大小由处理核心检查）
+            try:
+                self.pipeline.crop(orig_x1, orig_y1, orig_x2, orig_y2)
+            except ValueError as e:
+                messagebox.showwarning("警告", str(e))
                 return
             
-            # 执行裁剪
-            self.original_image = self.original_image[orig_y1:orig_y2, orig_x1:orig_x2]
-            
-            # 重置后续处理结果
-            self.grayscale_image = None
-            self.binary_image = None
-            self.current_stage = "original"
-            
             # 关闭裁剪窗口
             self.cancel_crop()
             
-            # 更新主界面显示
-            self.clear_canvas(self.grayscale_canvas)
-            self.clear_canvas(self.binary_canvas)
-            self.grayscale_info.config(text="暂无图像")
-            self.binary_info.config(text="暂无图像")
-            
-            # 显示裁剪后的图像
-            self.display_image_on_canvas(self.original_image, self.original_canvas, self.original_info)
-            
-            # 更新按钮状态
-            self.update_button_states()
-            
-            # 重置阈值滑块
-            self.threshold_scale.config(state='disabled')
-            self.threshold_info.config(text="请先完成前面的步骤", foreground='#95a5a6')
-            self.update_pixel_stats()
+            # 显示裁剪后的图像并重置后续处理结果
+            self.on_original_changed()
             
             messagebox.showinfo("成功", "图像裁剪完成！")
             
@@ -601,72 +1094,329 @@ class ImageBinarizationApp:
     
     def restore_original(self):
         """恢复原图"""
-        if self.backup_original is None:
+        if self.pipeline.history is None:
             messagebox.showwarning("警告", "没有可恢复的原图！")
             return
         
         try:
-            # 恢复原图
-            self.original_image = self.backup_original.copy()
-            
-            # 重置状态
-            self.grayscale_image = None
-            self.binary_image = None
-            self.current_stage = "original"
-            
-            # 清除其他画布
-            self.clear_canvas(self.grayscale_canvas)
-            self.clear_canvas(self.binary_canvas)
-            self.grayscale_info.config(text="暂无图像")
-            self.binary_info.config(text="暂无图像")
-            
-            # 显示原图
-            self.display_image_on_canvas(self.original_image, self.original_canvas, self.original_info)
-            
-            # 更新按钮状态
-            self.update_button_states()
-            
-            # 重置阈值滑块和统计
-            self.threshold_scale.config(state='disabled')
-            self.threshold_info.config(text="请先完成前面的步骤", foreground='#95a5a6')
-            self.update_pixel_stats()
+            # 恢复原图（切换回原图缓冲区的完整视图，不复制像素）
+            self.pipeline.restore()
+            self.on_original_changed()
             
             messagebox.showinfo("成功", "原图已恢复！")
             
         except Exception as e:
             messagebox.showerror("错误", f"恢复原图时发生错误: {str(e)}")
     
+    def undo_edit(self):
+        """撤销上一次裁剪/恢复"""
+        try:
+            self.pipeline.undo()
+            self.on_original_changed()
+        except ValueError as e:
+            messagebox.showwarning("警告", str(e))
+    
+    def redo_edit(self):
+        """重做被撤销的裁剪/恢复"""
+        try:
+            self.pipeline.redo()
+            self.on_original_changed()
+        except ValueError as e:
+            messagebox.showwarning("警告", str(e))
+    
+    def on_original_changed(self):
+        """原图发生变化（裁剪/恢复/撤销/重做）后重置后续处理结果并刷新显示"""
+        self.cancel_image_jobs()
+        self.close_threshold_sweep()  # 扫描曲线属于之前的图像
+        self.rendered_frame_key = None
+        self.viewport.reset()  # 裁剪/撤销后图像尺寸可能变化，视口恢复为适应画布
+        
+        # 重置状态
+        self.current_stage = "original"
+        
+        # 清除其他画布
+        self.clear_canvas(self.grayscale_canvas)
+        self.clear_canvas(self.binary_canvas)
+        self.grayscale_info.config(text="暂无图像")
+        self.binary_info.config(text="暂无图像")
+        
+        # 显示原图
+        self.display_image_on_canvas(self.original_display_image(), self.original_canvas,
+                                     self.original_info, self.pipeline.original.shape)
+        
+        # 更新按钮状态
+        self.update_button_states()
+        
+        # 重置阈值控件和统计
+        self.update_threshold_controls()
+        self.threshold_info.config(text="请先完成前面的步骤", foreground='#95a5a6')
+        self.update_pixel_stats()
+    
+    def original_display_image(self):
+        """原图面板显示的图像：灰度导入且未裁剪时为按需读取的彩色缩小图，否则为当前原图"""
+        pipeline = self.pipeline
+        if pipeline.gray_method != GRAY_DECODE_METHOD or not pipeline.is_unedited:
+            return pipeline.original
+        origin = pipeline.history.origin
+        if self.color_display is not None and self.color_display[0] is origin:
+            return self.color_display[1]
+        if self.color_display_pending is not None and self.color_display_pending[0] is origin:
+            return pipeline.original  # 已在后台读取，拖动/缩放/刷新时不重复提交
+        
+        # 彩色图还没有读取：先显示灰度原图，后台读取缩小的彩色图（每个原图缓冲区只提交一次）
+        def color_job(token, buffer, path):
+            color_image = load_display_color(path, PREVIEW_DECODE_SIDE)
+            token.check()
+            return token, buffer, color_image
+        
+        token = self.executor.submit("color", color_job, origin, pipeline.source_path,
+                                     on_done=self.on_color_display_loaded,
+                                     on_error=self.on_color_display_failed)
+        self.color_display_pending = (origin, token)
+        return pipeline.original
+    
+    def on_color_display_failed(self, error):
+        self.color_display_pending = None
+        print(f"读取彩色显示图时发生错误: {str(error)}")
+    
+    def on_color_display_loaded(self, result):
+        """彩色显示图读取完成（界面线程）"""
+        token, buffer, color_image = result
+        if self.color_display_pending is None or self.color_display_pending[1] is not token:
+            return  # 已被更新的原图取代
+        self.color_display_pending = None
+        if self.pipeline.history is None or buffer is not self.pipeline.history.origin:
+            return
+        self.color_display = (buffer, color_image)
+        if self.pipeline.is_unedited:
+            self.display_image_on_canvas(color_image, self.original_canvas, self.original_info,
+                                         self.pipeline.original.shape)
+    
     def on_threshold_change(self, value):
         """阈值改变时的处理（实时更新）"""
         threshold = int(float(value))
         self.threshold_label.config(text=str(threshold))
-        
-        if self.current_stage == "binary" and self.grayscale_image is not None:
-            self.process_binary_image()
+        self.instrumentation.count('slider_events')
+        self.request_render()
+        self.update_sweep_marker(threshold)
+    
+    def on_window_change(self, value):
+        """窗口大小改变时的处理（取奇数，实时更新）"""
+        window = odd_window(float(value))
+        self.window_label.config(text=str(window))
+        self.instrumentation.count('slider_events')
+        self.request_render()
+    
+    def on_mode_change(self, event=None):
+        """切换阈值模式"""
+        mode = self.current_settings().mode
+        if mode in DEFAULT_K:
+            self.k_value.set(DEFAULT_K[mode])
+        self.update_threshold_controls()
+        self.on_threshold_params_change()
+    
+    def on_threshold_params_change(self, event=None):
+        """模式、窗口大小、k 值或偏移量改变后刷新二值化预览"""
+        self.request_render()
+    
+    def request_render(self, view_changed=False):
+        """请求重绘二值化预览（view_changed=True 时重绘全部面板）：已有待渲染的帧时直接合并，
+        否则在下一个显示帧渲染
+
+        渲染时读取控件的最新值，因此拖动结束后最后的值一定会被渲染（且只渲染一次）。
+        """
+        if view_changed:
+            self.view_dirty = True
+        elif self.current_stage != "binary" or self.pipeline.grayscale is None:
+            return
+        if self.render_after_id is not None:
+            if not view_changed:
+                self.instrumentation.count('slider_coalesced')
+            return
+        elapsed_ms = (time.perf_counter() - self.last_frame_time) * 1000
+        delay = max(0, int(FRAME_INTERVAL_MS - elapsed_ms))
+        self.render_after_id = self.root.after(delay, self.render_frame)
+    
+    def render_frame(self):
+        """渲染一帧（参数与上一帧完全相同时跳过，例如滑块在同一整数值内移动）"""
+        self.render_after_id = None
+        self.last_frame_time = time.perf_counter()
+        if self.view_dirty:
+            # 视口变化：三个面板都按新视口重绘（二值化预览参数有变化时一并更新）
+            self.view_dirty = False
+            with self.instrumentation.span('view_frame'):
+                self.refresh_all_images()
+            return
+        if self.current_stage != "binary" or self.pipeline.grayscale is None:
+            return
+        if self.frame_key() == self.rendered_frame_key:
+            self.instrumentation.count('slider_skipped')
+            return
+        self.instrumentation.count('slider_frames')
+        self.process_binary_image()
+    
+    def frame_key(self):
+        canvas = self.binary_canvas
+        return (self.current_settings().key(), (canvas.winfo_width(), canvas.winfo_height()),
+                self.viewport.key(), id(self.pipeline.grayscale))
+    
+    def on_view_zoom(self, event, canvas):
+        """滚轮缩放（以鼠标位置为中心），三个面板同步"""
+        if self.pipeline.original is None:
+            return "break"
+        up = getattr(event, 'delta', 0) > 0 or getattr(event, 'num', None) == 4
+        if self.viewport.zoom_at(1.25 if up else 0.8, self.pipeline.original.shape,
+                                 canvas.winfo_width(), canvas.winfo_height(), event.x, event.y):
+            self.request_render(view_changed=True)
+        return "break"
+    
+    def on_pan_start(self, event):
+        self.pan_start = (event.x, event.y)
+    
+    def on_pan_move(self, event, canvas):
+        """拖动平移（仅在放大时有效）"""
+        if self.pan_start is None or self.pipeline.original is None:
+            return
+        dx, dy = event.x - self.pan_start[0], event.y - self.pan_start[1]
+        self.pan_start = (event.x, event.y)
+        if self.viewport.pan(dx, dy, self.pipeline.original.shape,
+                             canvas.winfo_width(), canvas.winfo_height()):
+            self.request_render(view_changed=True)
+    
+    def on_view_reset(self, event=None):
+        """双击恢复为整幅图像适应画布"""
+        if not self.viewport.is_fit:
+            self.viewport.reset()
+            self.request_render(view_changed=True)
+    
+    def current_settings(self):
+        """由界面控件组成当前的阈值参数"""
+        labels = {label: mode for mode, label in THRESHOLD_MODES.items()}
+        mode = labels.get(self.threshold_mode.get(), 'global')
+        try:
+            k = self.k_value.get()
+        except tk.TclError:
+            k = None  # 输入框内容无效时使用默认值
+        try:
+            offset = self.offset_value.get()
+        except tk.TclError:
+            offset = 2
+        return ThresholdSettings(mode, threshold=self.threshold_value.get(),
+                                 window=self.window_value.get(), k=k, offset=offset)
+    
+    def update_threshold_controls(self):
+        """按当前阶段和模式启用/禁用阈值滑块、窗口大小和 k/C 输入框"""
+        settings = self.current_settings()
+        active = self.current_stage == "binary"
+        local_window = settings.mode in LOCAL_MODES
+        self.threshold_scale.config(state='normal' if active and settings.mode == 'global' else 'disabled')
+        self.window_scale.config(state='normal' if active and local_window else 'disabled')
+        self.k_spin.config(state='normal' if active and settings.mode in ('sauvola', 'niblack') else 'disabled')
+        self.offset_spin.config(state='normal' if active and settings.mode in ('adaptive_mean', 'adaptive_gaussian') else 'disabled')
     
     def process_binary_image(self):
-        """处理二值化图像"""
-        if self.grayscale_image is None:
+        """处理二值化图像（仅更新预览，全分辨率结果在保存或统计时再计算）"""
+        if self.pipeline.grayscale is None:
             return
         
         try:
-            # 应用二值化
-            threshold = self.threshold_value.get()
-            _, binary_image = cv2.threshold(self.grayscale_image, threshold, 255, cv2.THRESH_BINARY)
-            
-            self.binary_image = binary_image
-            
-            # 显示二值化结果
-            self.display_image_on_canvas(self.binary_image, self.binary_canvas, self.binary_info)
+            preview_gray = self.get_preview_gray()
+            if preview_gray is None:
+                self.root.after(100, self.process_binary_image)
+                return
             
-            # 更新像素统计
-            self.update_pixel_stats()
+            # 一帧：从阈值参数变化到预览重绘完成
+            with self.instrumentation.span('frame'):
+                settings = self.current_settings()
+                threshold = self.pipeline.effective_threshold(settings)
+                if threshold is not None:
+                    # 查表二值化：只处理画布尺寸的预览图，与原图分辨率无关
+                    # （Otsu/三角法的阈值由缓存的直方图求出）
+                    if settings.mode != 'global':
+                        self.threshold_value.set(threshold)
+                        self.threshold_label.config(text=f"{threshold}（自动）")
+                    else:
+                        self.threshold_label.config(text=str(threshold))
+                    with self.instrumentation.span('threshold'):
+                        # 直接写入画布渲染目标的缓冲区，拖动滑块时不分配新数组
+                        preview_binary = self.render_target(self.binary_canvas).buffer_for(preview_gray.shape)
+                        cv2.threshold(preview_gray, threshold, 255, cv2.THRESH_BINARY, dst=preview_binary)
+                else:
+                    # 局部阈值：窗口按预览缩放比例缩小后在预览图上计算
+                    scale = self.preview_scale
+                    with self.instrumentation.span('threshold', mode=settings.mode):
+                        preview_binary = local_binarize(preview_gray, settings.scaled(scale))
+                    self.threshold_label.config(text="局部")
+                
+                # 显示二值化预览
+                self.show_image_on_canvas(preview_binary, self.pipeline.grayscale.shape,
+                                          self.binary_canvas, self.binary_info)
+                self.rendered_frame_key = self.frame_key()
+                
+                # 更新像素统计
+                self.update_pixel_stats()
+                
+                # 全分辨率结果在后台计算（新阈值到来时旧任务作废）
+                self.schedule_full_binarization(settings)
             
         except Exception as e:
             messagebox.showerror("错误", f"处理二值化图像时发生错误: {str(e)}")
     
-    def display_image_on_canvas(self, image, canvas, info_label):
-        """在指定画布上显示图像"""
+    def schedule_full_binarization(self, settings):
+        """在后台按指定阈值参数计算全分辨率二值化图像
+
+        结果只保留在内存中（只查找不写入磁盘缓存），保存时才写入结果缓存。
+        """
+        if self.pipeline.has_binary(settings):
+            self.executor.cancel("threshold")
+            return
+        
+        instrumentation = self.instrumentation
+        cache = self.pipeline.result_cache
+        
+        def threshold_job(token, gray_image, histogram, settings, key):
+            with instrumentation.span('threshold_full', mode=settings.mode):
+                binary_image = pack_cached(gray_image, settings, histogram, cache, key,
+                                           check=token.check, store=False)
+            return gray_image, settings, binary_image
+        
+        self.executor.submit("threshold", threshold_job, self.pipeline.grayscale,
+                             self.pipeline.histogram, settings, self.pipeline.cache_key(settings),
+                             label="二值化", on_done=self.on_binary_ready,
+                             on_error=lambda e: print(f"处理二值化图像时发生错误: {str(e)}"))
+    
+    def on_binary_ready(self, result):
+        """全分辨率二值化结果在后台计算完成后的处理（界面线程）"""
+        gray_image, settings, binary_image = result
+        if gray_image is self.pipeline.grayscale:
+            self.pipeline.set_binary(binary_image, settings)
+            # 局部阈值模式的统计依赖全分辨率结果
+            if not settings.is_global and settings == self.current_settings():
+                self.update_pixel_stats()
+    
+    def get_preview_gray(self):
+        """获取按二值化画布尺寸和当前视口缩放的灰度预览图（每张图像/画布尺寸/视口只缩放一次）"""
+        canvas_width = self.binary_canvas.winfo_width()
+        canvas_height = self.binary_canvas.winfo_height()
+        if canvas_width <= 1 or canvas_height <= 1:
+            return None
+        
+        preview_size = ((canvas_width, canvas_height), self.viewport.key())
+        if self.preview_source is not self.pipeline.grayscale or self.preview_size != preview_size:
+            # 只缩放视口内的区域
+            region, (new_width, new_height) = self.viewport.region(self.pipeline.grayscale.shape,
+                                                                   canvas_width, canvas_height)
+            if new_width <= 0 or new_height <= 0:
+                return None
+            with self.instrumentation.span('resize', canvas='preview'):
+                self.preview_gray = self.pipeline.pyramid('grayscale').resize_region(region, new_width, new_height)
+            self.preview_source = self.pipeline.grayscale
+            self.preview_size = preview_size
+            self.preview_scale = new_width / region[2]
+        return self.preview_gray
+    
+    def display_image_on_canvas(self, image, canvas, info_label, source_shape=None):
+        """在指定画布上显示图像（source_shape 为信息标签显示的原图形状，默认为 image 的形状）"""
         if image is None:
             return
         
@@ -676,65 +1426,73 @@ class ImageBinarizationApp:
             canvas_height = canvas.winfo_height()
             
             if canvas_width <= 1 or canvas_height <= 1:
-                self.root.after(100, lambda: self.display_image_on_canvas(image, canvas, info_label))
+                self.root.after(100, lambda: self.display_image_on_canvas(image, canvas, info_label,
+                                                                          source_shape))
                 return
             
-            # 计算缩放比例以适应画布
-            if len(image.shape) == 3:
-                img_height, img_width = image.shape[:2]
-            else:
-                img_height, img_width = image.shape
-            
-            scale_x = (canvas_width - 20) / img_width
-            scale_y = (canvas_height - 20) / img_height
-            scale = min(scale_x, scale_y, 1.0)  # 不放大，只缩小
+            # 同一图像、同一画布尺寸、同一视口且已在显示中，无需重新缩放和绘制
+            display_key = ((canvas_width, canvas_height), self.viewport.key())
+            cached = self.display_cache.get(canvas)
+            if (cached is not None and cached[0] is image
+                    and cached[1] == display_key and self.render_target(canvas).showing):
+                return
             
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
+            # 视口内的可见区域及其显示尺寸（未放大时即整幅图像适应画布）
+            region, (new_width, new_height) = self.viewport.region(image.shape, canvas_width, canvas_height)
             
-            # 调整图像大小
+            # 只缩放可见区域（当前原图/灰度图从金字塔中最接近的层级截取）
             if new_width > 0 and new_height > 0:
-                resized_image = cv2.resize(image, (new_width, new_height), 
-                                         interpolation=cv2.INTER_AREA)
-                
-                # 转换为PIL图像
-                if len(resized_image.shape) == 2:
-                    # 灰度图或二值图
-                    pil_image = Image.fromarray(resized_image)
-                else:
-                    # 彩色图
-                    pil_image = Image.fromarray(resized_image)
-                
-                photo = ImageTk.PhotoImage(pil_image)
-                
-                # 清除画布并显示新图像
-                canvas.delete("all")
-                
-                # 居中显示图像
-                x = (canvas_width - new_width) // 2
-                y = (canvas_height - new_height) // 2
-                
-                canvas.create_image(x, y, anchor=tk.NW, image=photo)
-                
-                # 保存图像引用以防被垃圾回收
-                canvas.image = photo
-                
-                # 更新信息标签
-                info_text = f"{img_width} × {img_height}"
-                if len(image.shape) == 2:
-                    info_text += " (灰度)"
-                else:
-                    info_text += f" ({image.shape[2]}通道)"
-                info_label.config(text=info_text)
+                with self.instrumentation.span('resize'):
+                    pyramid = self.pipeline.pyramid_for(image)
+                    if pyramid is not None:
+                        resized_image = pyramid.resize_region(region, new_width, new_height)
+                    else:
+                        # 彩色显示图等小图：直接截取可见区域缩放
+                        x, y, width, height = region
+                        resized_image = cv2.resize(
+                            image[y:y + height, x:x + width], (new_width, new_height),
+                            interpolation=cv2.INTER_AREA if new_width <= width else cv2.INTER_NEAREST)
+                self.show_image_on_canvas(resized_image, source_shape or image.shape, canvas, info_label)
+                self.display_cache[canvas] = (image, display_key, resized_image)
             
         except Exception as e:
             print(f"显示图像时发生错误: {str(e)}")
     
+    def show_image_on_canvas(self, display_image, source_shape, canvas, info_label):
+        """将已缩放好的图像居中绘制到画布上（复用画布的 PhotoImage），信息标签显示原图尺寸"""
+        target = self.render_target(canvas)
+        
+        # 原地更新画布上已有的 PhotoImage（尺寸变化时才重新分配）
+        with self.instrumentation.span('photoimage'):
+            if target.update(display_image):
+                self.instrumentation.count('photoimage_allocations')
+        
+        with self.instrumentation.span('redraw'):
+            target.place()
+        
+        # 更新信息标签
+        img_height, img_width = source_shape[:2]
+        info_text = f"{img_width} × {img_height}"
+        if len(source_shape) == 2:
+            info_text += " (灰度)"
+        else:
+            info_text += f" ({source_shape[2]}通道)"
+        if not self.viewport.is_fit:
+            info_text += f"  放大 {self.viewport.zoom:.1f}×"
+        info_label.config(text=info_text)
+    
     def clear_canvas(self, canvas):
         """清除画布内容"""
+        self.render_target(canvas).clear()
         canvas.delete("all")
-        if hasattr(canvas, 'image'):
-            delattr(canvas, 'image')
+        self.display_cache.pop(canvas, None)
+    
+    def render_target(self, canvas):
+        """画布的持久渲染目标（首次使用时创建）"""
+        target = self.render_targets.get(canvas)
+        if target is None:
+            target = self.render_targets[canvas] = CanvasRenderTarget(canvas)
+        return target
     
     def update_button_states(self):
         """更新按钮状态"""
@@ -766,10 +1524,22 @@ class ImageBinarizationApp:
             self.crop_btn.config(state='normal')
             self.restore_btn.config(state='normal')
             self.stats_btn.config(state='normal')
+        
+        # 阈值扫描只需要灰度直方图
+        self.sweep_btn.config(state='normal' if self.pipeline.histogram is not None
+                              and self.current_stage in ("grayscale", "binary") else 'disabled')
+        
+        # 批量处理使用当前页调好的参数，同一时间只运行一个批量任务
+        can_apply = self.current_stage == "binary" and self.batch_job is None
+        self.apply_folder_btn.config(state='normal' if can_apply else 'disabled')
+        
+        # 撤销/重做取决于编辑历史
+        self.undo_btn.config(state='normal' if self.pipeline.can_undo else 'disabled')
+        self.redo_btn.config(state='normal' if self.pipeline.can_redo else 'disabled')
     
     def update_pixel_stats(self):
-        """自动更新像素统计信息（内部调用）"""
-        if self.binary_image is None:
+        """自动更新像素统计信息（内部调用，拖动滑块时实时刷新）"""
+        if self.current_stage != "binary" or self.pipeline.histogram is None:
             # 清空统计信息
             self.black_pixels_label.config(text="--")
             self.white_pixels_label.config(text="--")
@@ -777,40 +1547,62 @@ class ImageBinarizationApp:
             self.ratio_label.config(text="--")
             return
         
-        # 自动统计（不显示详细信息）
+        # 全局模式基于直方图统计，不访问像素数据；局部模式等待后台的全分辨率结果
         try:
-            total_pixels = self.binary_image.size
-            self.total_pixels_label.config(text=f"{total_pixels:,}")
+            settings = self.current_settings()
+            if not settings.is_global and not self.pipeline.has_binary(settings):
+                for label in (self.black_pixels_label, self.white_pixels_label, self.ratio_label):
+                    label.config(text="计算中...")
+                return
+            stats = self.pipeline.stats(settings)
+            self.show_pixel_stats(stats['black'], stats['white'])
         except Exception as e:
             print(f"更新像素统计时发生错误: {str(e)}")
     
+    def show_pixel_stats(self, black_pixels, white_pixels):
+        """在统计面板上显示黑白像素数量及比例"""
+        total_pixels = black_pixels + white_pixels
+        if total_pixels > 0:
+            black_ratio = (black_pixels / total_pixels) * 100
+            white_ratio = (white_pixels / total_pixels) * 100
+            self.black_pixels_label.config(text=f"{black_pixels:,} ({black_ratio:.1f}%)")
+            self.white_pixels_label.config(text=f"{white_pixels:,} ({white_ratio:.1f}%)")
+            self.total_pixels_label.config(text=f"{total_pixels:,}")
+            
+            if black_pixels > 0 and white_pixels > 0:
+                self.ratio_label.config(text=f"白:黑 = {white_pixels / black_pixels:.2f}:1")
+            else:
+                self.ratio_label.config(text="N/A")
+        else:
+            self.black_pixels_label.config(text="0")
+            self.white_pixels_label.config(text="0")
+            self.total_pixels_label.config(text="0")
+            self.ratio_label.config(text="N/A")
+    
     def calculate_pixel_statistics(self):
         """计算并显示详细的像素统计信息（按钮触发）"""
-        if self.binary_image is None:
+        if self.current_stage != "binary" or self.pipeline.histogram is None:
             messagebox.showwarning("警告", "请先完成二值化处理！")
             return
         
         try:
-            # 统计黑白像素
-            total_pixels = self.binary_image.size
-            white_pixels = np.sum(self.binary_image == 255)
-            black_pixels = np.sum(self.binary_image == 0)
+            settings = self.current_settings()
+            if not settings.is_global and not self.pipeline.has_binary(settings):
+                messagebox.showinfo("提示", "全分辨率二值化结果仍在后台计算中，请稍后再统计。")
+                return
+            
+            # 统计黑白像素（全局模式为直方图累加，与全图逐像素统计结果一致）
+            stats = self.pipeline.stats(settings)
+            black_pixels, white_pixels, total_pixels = stats['black'], stats['white'], stats['total']
+            self.show_pixel_stats(black_pixels, white_pixels)
             
-            # 计算比例
             if total_pixels > 0:
                 black_ratio = (black_pixels / total_pixels) * 100
                 white_ratio = (white_pixels / total_pixels) * 100
-                
-                # 更新显示
-                self.black_pixels_label.config(text=f"{black_pixels:,} ({black_ratio:.1f}%)")
-                self.white_pixels_label.config(text=f"{white_pixels:,} ({white_ratio:.1f}%)")
-                self.total_pixels_label.config(text=f"{total_pixels:,}")
-                
-                if black_pixels > 0 and white_pixels > 0:
-                    ratio = white_pixels / black_pixels
-                    self.ratio_label.config(text=f"白:黑 = {ratio:.2f}:1")
+                if black_pixels > 0:
+                    ratio_text = f"{white_pixels / black_pixels:.2f} : 1"
                 else:
-                    self.ratio_label.config(text="N/A")
+                    ratio_text = "N/A"
                 
                 # 显示详细统计信息对话框
                 stats_info = f"""二值化图像像素统计结果：
@@ -823,16 +1615,10 @@ class ImageBinarizationApp:
 ⚪ 白色像素点数量：{white_pixels:,} 个  
    占比：{white_ratio:.2f}%
 
-📈 黑白比例：白色 : 黑色 = {ratio:.2f} : 1"""
+📈 黑白比例：白色 : 黑色 = {ratio_text}"""
                 
                 messagebox.showinfo("像素统计结果", stats_info)
                 
-            else:
-                self.black_pixels_label.config(text="0")
-                self.white_pixels_label.config(text="0")
-                self.total_pixels_label.config(text="0")
-                self.ratio_label.config(text="N/A")
-                
         except Exception as e:
             messagebox.showerror("错误", f"统计像素时发生错误: {str(e)}")
             self.black_pixels_label.config(text="错误")
@@ -840,17 +1626,122 @@ class ImageBinarizationApp:
             self.total_pixels_label.config(text="错误")
             self.ratio_label.config(text="错误")
     
+    def show_threshold_sweep(self):
+        """显示全部 256 个阈值下的黑白占比曲线（只用直方图累加，不访问像素），点击曲线设置阈值"""
+        histogram = self.pipeline.histogram
+        if histogram is None:
+            messagebox.showwarning("警告", "请先转换灰度图！")
+            return
+        
+        try:
+            # matplotlib 较大，只在打开扫描窗口时导入
+            import matplotlib
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        except ImportError:
+            messagebox.showerror("错误", "显示阈值扫描曲线需要安装 matplotlib！")
+            return
+        
+        if self.sweep_window is not None:
+            self.close_threshold_sweep()
+        
+        with self.instrumentation.span('sweep'):
+            black, white = threshold_sweep(histogram)
+            total = max(int(black[-1]), 1)
+            black_ratio = black * (100.0 / total)
+            white_ratio = white * (100.0 / total)
+        
+        # 中文标签使用系统中可用的中文字体
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Noto Sans CJK SC',
+                                                  'WenQuanYi Micro Hei', 'DejaVu Sans']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+        
+        window = tk.Toplevel(self.root)
+        window.title("阈值扫描曲线")
+        window.geometry("720x520")
+        window.protocol("WM_DELETE_WINDOW", self.close_threshold_sweep)
+        
+        figure = Figure(figsize=(7, 4.5), dpi=100)
+        axes = figure.add_subplot(111)
+        thresholds = np.arange(256)
+        axes.plot(thresholds, black_ratio, color='#2c3e50', label="黑色占比")
+        axes.plot(thresholds, white_ratio, color='#95a5a6', label="白色占比")
+        otsu = otsu_threshold(histogram)
+        axes.axvline(otsu, color='#27ae60', linestyle='--', linewidth=1, label=f"Otsu = {otsu}")
+        marker = axes.axvline(self.threshold_value.get(), color='#e74c3c', linewidth=1.5,
+                              label="当前阈值")
+        axes.set_xlim(0, 255)
+        axes.set_ylim(0, 100)
+        axes.set_xlabel("阈值")
+        axes.set_ylabel("像素占比（%）")
+        axes.grid(True, alpha=0.3)
+        axes.legend(loc='center right')
+        figure.tight_layout()
+        
+        canvas = FigureCanvasTkAgg(figure, master=window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        def on_click(event):
+            # 点击曲线：把点击位置设为阈值
+            if event.inaxes is axes and event.xdata is not None:
+                threshold = int(round(min(max(event.xdata, 0), 255)))
+                self.threshold_value.set(threshold)
+                self.on_threshold_change(str(threshold))
+        
+        canvas.mpl_connect('button_press_event', on_click)
+        
+        button_frame = ttk.Frame(window, padding="5")
+        button_frame.pack(fill=tk.X)
+        ttk.Button(button_frame, text="导出 CSV", command=self.export_threshold_sweep,
+                   style='Modern.TButton').pack(side=tk.LEFT)
+        ttk.Label(button_frame, text="点击曲线可直接设置阈值", style='Info.TLabel').pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.sweep_window = (window, canvas, marker, histogram)
+        canvas.draw()
+    
+    def update_sweep_marker(self, threshold):
+        """阈值改变时移动扫描曲线上的当前阈值标记"""
+        if self.sweep_window is None:
+            return
+        _, canvas, marker, _ = self.sweep_window
+        marker.set_xdata([threshold, threshold])
+        canvas.draw_idle()
+    
+    def close_threshold_sweep(self):
+        if self.sweep_window is not None:
+            self.sweep_window[0].destroy()
+            self.sweep_window = None
+    
+    def export_threshold_sweep(self):
+        """把扫描窗口对应的直方图导出为 CSV（每个阈值一行）"""
+        if self.sweep_window is None:
+            return
+        file_path = filedialog.asksaveasfilename(
+            title="导出阈值扫描结果",
+            defaultextension=".csv",
+            filetypes=[('CSV文件', '*.csv'), ('所有文件', '*.*')],
+            parent=self.sweep_window[0]
+        )
+        if file_path:
+            try:
+                write_sweep_csv(file_path, self.sweep_window[3])
+                messagebox.showinfo("成功", f"阈值扫描结果已导出到:\n{file_path}")
+            except Exception as e:
+                messagebox.showerror("错误", f"导出阈值扫描结果时发生错误: {str(e)}")
+    
     def save_result(self):
         """保存处理结果"""
-        if self.binary_image is None:
+        if self.current_stage != "binary":
             messagebox.showwarning("警告", "没有可保存的二值化图像！")
             return
         
+        # PNG/TIFF/PBM 以1位格式保存（TIFF 使用 CCITT G4 压缩）
         file_types = [
-            ('PNG文件', '*.png'),
+            ('PNG文件（1位）', '*.png'),
+            ('TIFF文件（1位 CCITT G4）', '*.tiff'),
+            ('PBM文件（1位）', '*.pbm'),
             ('JPEG文件', '*.jpg'),
-            ('BMP文件', '*.bmp'),
-            ('TIFF文件', '*.tiff')
+            ('BMP文件', '*.bmp')
         ]
         
         file_path = filedialog.asksaveasfilename(
@@ -860,31 +1751,237 @@ class ImageBinarizationApp:
         )
         
         if file_path:
-            try:
-                cv2.imwrite(file_path, self.binary_image)
+            gray_image = self.pipeline.grayscale
+            histogram = self.pipeline.histogram
+            settings = self.current_settings()
+            cached = self.pipeline.binary if self.pipeline.has_binary(settings) else None
+            cache, key = self.pipeline.result_cache, self.pipeline.cache_key(settings)
+            
+            def save_job(token, path):
+                # 后台已算好（或磁盘缓存中已有）的全分辨率结果可直接写出
+                binary_image = cached if cached is not None else pack_cached(
+                    gray_image, settings, histogram, cache, key, check=token.check)
+                if cached is not None and cache is not None and key is not None and not cache.contains(key):
+                    cache.put(key, cached, histogram)  # 拖动滑块时算好的结果只在保存时写入磁盘缓存
+                write_binary(path, binary_image)
+                return gray_image, settings, binary_image
+            
+            def on_done(result):
+                self.on_binary_ready(result)
                 messagebox.showinfo("成功", "二值化图像保存成功！")
-            except Exception as e:
-                messagebox.showerror("错误", f"保存图像时发生错误: {str(e)}")
+            
+            self.executor.submit("save", save_job, file_path, label="保存结果", on_done=on_done,
+                                 on_error=lambda e: messagebox.showerror("错误", f"保存图像时发生错误: {str(e)}"))
     
     def on_window_resize(self, event):
         """窗口大小改变时的处理"""
         if event.widget == self.root:
-            # 延迟更新显示以避免频繁刷新
-            self.root.after(200, self.refresh_all_images)
+            # 防抖：拖动缩放时只保留最后一次刷新
+            if self.resize_after_id is not None:
+                self.root.after_cancel(self.resize_after_id)
+            self.resize_after_id = self.root.after(200, self.refresh_all_images)
     
     def refresh_all_images(self):
-        """刷新所有图像显示"""
-        if self.original_image is not None:
-            self.display_image_on_canvas(self.original_image, self.original_canvas, self.original_info)
+        """刷新所有图像显示（画布尺寸未变化的面板会直接跳过）"""
+        self.resize_after_id = None
         
-        if self.grayscale_image is not None:
-            self.display_image_on_canvas(self.grayscale_image, self.grayscale_canvas, self.grayscale_info)
+        if self.pipeline.original is not None:
+            self.display_image_on_canvas(self.original_display_image(), self.original_canvas,
+                                         self.original_info, self.pipeline.original.shape)
         
-        if self.binary_image is not None:
-            self.display_image_on_canvas(self.binary_image, self.binary_canvas, self.binary_info)
+        if self.pipeline.grayscale is not None:
+            self.display_image_on_canvas(self.pipeline.grayscale, self.grayscale_canvas, self.grayscale_info)
+        
+        if self.current_stage == "binary" and self.frame_key() != self.rendered_frame_key:
+            self.process_binary_image()
+
+    def cancel_image_jobs(self):
+        """取消基于当前图像的后台任务（保存任务不受影响）"""
+        for channel in ("preview", "image", "color", "grayscale", "threshold"):
+            self.executor.cancel(channel)
+        self.color_display_pending = None
+    
+    def poll_background_results(self):
+        """定时在界面线程中处理后台任务结果并刷新进度指示"""
+        self.executor.process_results()
+        self.update_progress_indicator()
+        if self.batch_job is not None:
+            self.update_batch_progress()
+        if self.session is not None:
+            visible = self.visible_thumbnail_range()
+            if any(index in visible for index in self.session.completed_thumbnails()):
+                self.render_thumbnail_strip()
+        self.root.after(30, self.poll_background_results)
+    
+    def update_progress_indicator(self):
+        """运行超过0.2秒的任务显示进度条"""
+        long_jobs = [(label, elapsed) for label, elapsed in self.executor.active_jobs()
+                     if label and elapsed > 0.2]
+        if long_jobs:
+            label, elapsed = max(long_jobs, key=lambda job: job[1])
+            self.progress_label.config(text=f"正在{label}... {elapsed:.1f} s")
+            if not self.progress_running:
+                self.progress_bar.start(10)
+                self.progress_running = True
+        elif self.progress_running:
+            self.progress_bar.stop()
+            self.progress_label.config(text="就绪")
+            self.progress_running = False
+    
+    def apply_to_folder(self):
+        """把当前的裁剪区域、灰度导入方式和阈值参数应用到一个文件夹中的所有图片（多进程，可取消）"""
+        if self.current_stage != "binary" or self.batch_job is not None:
+            return
+        
+        source_dir = os.path.dirname(self.pipeline.source_path) if self.pipeline.source_path else None
+        input_dir = filedialog.askdirectory(title="选择要批量处理的文件夹", initialdir=source_dir)
+        if not input_dir:
+            return
+        output_dir = filedialog.askdirectory(title="选择结果保存的文件夹", initialdir=input_dir)
+        if not output_dir:
+            return
+        if os.path.abspath(output_dir) == os.path.abspath(input_dir):
+            messagebox.showwarning("警告", "结果文件夹不能与输入文件夹相同！")
+            return
+        
+        files = iter_image_files(input_dir)
+        if not files:
+            messagebox.showwarning("警告", "该文件夹中没有图片文件！")
+            return
+        
+        # 工作进程的线程数与 CPU 亲和性由环境变量配置（见 performance 模块）
+        try:
+            profile = PerformanceProfile.from_env()
+        except ValueError as e:
+            messagebox.showerror("错误", f"性能配置环境变量有误：{str(e)}")
+            return
+        
+        self.batch_job = BatchJob(files, input_dir, output_dir, threshold=self.current_settings(),
+                                  cache=self.pipeline.result_cache,
+                                  gray_decode=self.pipeline.gray_method == GRAY_DECODE_METHOD,
+                                  roi=self.pipeline.roi, profile=profile).start()
+        self.batch_progress.config(maximum=len(files), value=0)
+        self.cancel_batch_btn.config(state='normal')
+        self.update_button_states()
+        self.update_batch_progress()
+    
+    def cancel_batch_job(self):
+        if self.batch_job is not None:
+            self.batch_job.cancel()
+            self.cancel_batch_btn.config(state='disabled')
+            self.batch_info.config(text="正在取消（正在处理的图片处理完后停止）...")
+    
+    def update_batch_progress(self):
+        """刷新批量任务的进度、吞吐量和预计剩余时间（界面线程，随后台结果轮询调用）"""
+        job = self.batch_job
+        progress = job.progress()
+        completed = progress['processed'] + progress['failed']
+        self.batch_progress.config(value=completed)
+        
+        if not job.done:
+            if job.cancelled:
+                return
+            eta = f"{progress['eta']:.0f} s" if progress['eta'] is not None else "--"
+            self.batch_info.config(text=f"{completed} / {progress['total']} 张，"
+                                        f"{progress['throughput']:.1f} 张/秒，剩余约 {eta}")
+            return
+        
+        # 批量任务结束
+        self.batch_job = None
+        self.cancel_batch_btn.config(state='disabled')
+        self.update_button_states()
+        summary = (f"完成 {progress['processed']} 张，失败 {progress['failed']} 张，"
+                   f"用时 {progress['elapsed']:.1f} s（{progress['throughput']:.1f} 张/秒）")
+        self.batch_info.config(text=("已取消：" if job.cancelled else "") + summary)
+        if job.error is not None:
+            messagebox.showerror("错误", f"批量处理时发生错误: {str(job.error)}")
+        elif job.failures:
+            details = "\n".join(f"{os.path.basename(path)}: {error}" for path, error in job.failures[:10])
+            messagebox.showwarning("警告", f"{summary}\n\n{details}")
+    
+    def toggle_performance_overlay(self):
+        """开启/关闭性能浮层（开启时同时开启插桩）"""
+        if self.overlay_after_id is not None:
+            self.root.after_cancel(self.overlay_after_id)
+            self.overlay_after_id = None
+        
+        if self.overlay_value.get():
+            self.instrumentation.enabled = True
+            self.overlay_label.place(relx=1.0, rely=0.0, x=-15, y=20, anchor='ne')
+            self.overlay_label.lift()
+            self.update_performance_overlay()
+        else:
+            # 导出跟踪时仍需继续记录
+            self.instrumentation.enabled = self.instrumentation.tracing
+            self.overlay_label.place_forget()
+    
+    def update_performance_overlay(self):
+        """刷新浮层：帧延迟、各阶段耗时、滑块事件合并/丢弃数和内存"""
+        inst = self.instrumentation
+        lines = []
+        frame = inst.stats('frame')
+        if frame:
+            lines.append(f"帧延迟  {frame['last'] * 1000:6.1f} ms  平均 {frame['mean'] * 1000:.1f}  "
+                         f"p95 {frame['p95'] * 1000:.1f}  最大 {frame['max'] * 1000:.1f}")
+        else:
+            lines.append("帧延迟  --")
+        for name, title in (('threshold', '阈值'), ('resize', '缩放'), ('photoimage', 'PhotoImage'),
+                            ('redraw', '重绘'), ('threshold_full', '全分辨率'), ('first_pixel', '首次显示')):
+            stats = inst.stats(name)
+            if stats:
+                lines.append(f"{title:<10} {stats['last'] * 1000:6.1f} ms  平均 {stats['mean'] * 1000:.1f}")
+        
+        events = inst.counter('slider_events')
+        lines.append(f"滑块事件 {events}  渲染 {inst.counter('slider_frames')}  "
+                     f"合并 {inst.counter('slider_coalesced')}  跳过 {inst.counter('slider_skipped')}  "
+                     f"后台丢弃 {self.executor.dropped_jobs}")
+        lines.append(f"PhotoImage 分配 {inst.counter('photoimage_allocations')}")
+        
+        rss = current_rss_bytes()
+        if rss:
+            lines.append(f"内存 {rss / 1024 ** 2:.0f} MB")
+            inst.sample('rss_mb', round(rss / 1024 ** 2, 1))
+        
+        self.overlay_label.config(text="\n".join(lines))
+        self.overlay_after_id = self.root.after(OVERLAY_REFRESH_MS, self.update_performance_overlay)
+    
+    def export_trace(self):
+        """把记录的计时事件导出为 Chrome trace JSON（chrome://tracing / Perfetto）"""
+        if not self.instrumentation.tracing:
+            # 第一次点击开始记录，之后再次点击导出
+            self.instrumentation.enabled = True
+            self.instrumentation.tracing = True
+            messagebox.showinfo("提示", "已开始记录跟踪事件，操作完成后再次点击“导出跟踪文件”保存。")
+            return
+        
+        file_path = filedialog.asksaveasfilename(
+            title="导出跟踪文件",
+            defaultextension=".json",
+            filetypes=[('Chrome trace JSON', '*.json')]
+        )
+        if file_path:
+            try:
+                count = self.instrumentation.write_trace(file_path)
+                messagebox.showinfo("成功", f"已导出 {count} 个跟踪事件！")
+            except Exception as e:
+                messagebox.showerror("错误", f"导出跟踪文件时发生错误: {str(e)}")
+    
+    def on_close(self):
+        """关闭窗口"""
+        self.executor.shutdown()
+        self.close_session()
+        if self.batch_job is not None:
+            self.batch_job.cancel()
+        if self.trace_path:
+            try:
+                self.instrumentation.write_trace(self.trace_path)
+            except Exception as e:
+                print(f"写出跟踪文件时发生错误: {str(e)}")
+        self.root.destroy()
 
 def main():
     """主函数"""
+    print(format_hardware_report())  # 启动时报告启用的 SIMD 特性，便于复现性能测试
     root = tk.Tk()
     app = ImageBinarizationApp(root)
     root.mainloop()